@@ -0,0 +1,67 @@
+"""
+Backfill the daily usage history of every account into the SQLite store.
+
+    python3 backfill.py --since 2025-01-01
+
+Progress is checkpointed per user, so running the command again after an
+interruption continues from the last completed month.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+from sgcc_client import SGCCSpider
+from startup import load_accounts, setup_logging
+from utils import ScreenshotOnFailure
+
+
+def backfill_account(spider: SGCCSpider, since, only_users):
+    driver, _ = spider.acquire_driver()
+    ScreenshotOnFailure.set_driver(driver)
+    try:
+        if not (spider.restore_session(driver) or spider.perform_login(driver)):
+            logging.error(f"Login failed for account {spider.username[-4:]}")
+            return
+        if spider.enable_session_cache:
+            spider.session_store.save(driver)
+
+        user_ids = spider.get_user_ids(driver)
+        for index, user_id in enumerate(user_ids):
+            if user_id in spider.ignored_users or (only_users and user_id not in only_users):
+                continue
+            try:
+                count = spider.backfill_daily_usage(driver, user_id, index, since)
+                logging.info(f"User {user_id} backfill finished, {count} days written")
+            except Exception as e:
+                logging.error(f"Backfill of user {user_id} stopped: {e}. Run again to resume.")
+    finally:
+        spider.quit_driver()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill daily usage history into the SQLite store")
+    parser.add_argument("--since", default=f"{datetime.now().year - 1}-01-01", help="First day to fetch (YYYY-MM-DD), default: January 1st of last year")
+    parser.add_argument("--user", action="append", default=[], help="Only backfill this user ID (can be repeated)")
+    args = parser.parse_args()
+
+    if 'PYTHON_IN_DOCKER' not in os.environ:
+        import dotenv
+        dotenv.load_dotenv(verbose=True)
+    setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+
+    accounts = load_accounts()
+    if not accounts:
+        logging.error("Missing credentials (PHONE_NUMBER or PASSWORD).")
+        sys.exit(1)
+
+    since = datetime.strptime(args.since, "%Y-%m-%d").date()
+    ScreenshotOnFailure.init(root_dir='./errors')
+    for phone_number, password in accounts:
+        backfill_account(SGCCSpider(phone_number, password), since, set(args.user))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils import data_path
+
+# 16x16 difference hash: fine enough that the same background with the gap
+# somewhere else hashes several bits apart
+HASH_SIZE = 16
+
+
+def dhash(image):
+    """
+    Perceptual difference hash of a captcha image as a hex string
+    """
+    gray = np.asarray(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    return np.packbits((gray[:, 1:] > gray[:, :-1]).ravel()).tobytes().hex()
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class CaptchaCache:
+    """
+    Remembers solved captcha images (by perceptual hash) with the gap
+    position, confidence and whether the slide worked, so repeat images
+    skip the solver. Bounded by CAPTCHA_CACHE_SIZE, least recently used
+    entries are evicted first.
+
+    A failed slide may be the offset or the drag rather than the gap: an
+    image that once succeeded is never marked bad, others only after
+    CAPTCHA_CACHE_MAX_FAILURES failed slides. The slider offset of the
+    last slide is kept with its outcome.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.path = data_path(os.getenv("CAPTCHA_CACHE_DB", "captcha_cache.db"))
+        self.max_entries = int(os.getenv("CAPTCHA_CACHE_SIZE", 500))
+        self.max_distance = int(os.getenv("CAPTCHA_CACHE_MAX_DISTANCE", 2))
+        self.max_failures = int(os.getenv("CAPTCHA_CACHE_MAX_FAILURES", 2))
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS captcha (hash TEXT PRIMARY KEY, gap_x REAL, confidence REAL, success INTEGER, last_used REAL)")
+            # Columns added after the first release
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(captcha)")}
+            if "offset" not in columns:
+                conn.execute("ALTER TABLE captcha ADD COLUMN offset INTEGER")
+            if "failures" not in columns:
+                conn.execute("ALTER TABLE captcha ADD COLUMN failures INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup(self, key):
+        """
+        :return: (gap_x, confidence, success) of the closest cached image within max_distance, or None.
+                 success is None while the outcome of that slide is unknown.
+        """
+        with self._lock, self._connect() as conn:
+            match = conn.execute("SELECT hash, gap_x, confidence, success FROM captcha WHERE hash = ?", (key,)).fetchone()
+            if match is None and self.max_distance > 0:
+                closest = None
+                for row in conn.execute("SELECT hash, gap_x, confidence, success FROM captcha"):
+                    distance = hamming(key, row[0])
+                    if distance <= self.max_distance and (closest is None or distance < closest[0]):
+                        closest = (distance, row)
+                match = closest[1] if closest else None
+
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            conn.execute("UPDATE captcha SET last_used = ? WHERE hash = ?", (time.time(), match[0]))
+            success = None if match[3] is None else bool(match[3])
+            return match[1], match[2], success
+
+    def record(self, key, gap_x, confidence, success=None, offset=None):
+        with self._lock, self._connect() as conn:
+            previous = conn.execute("SELECT success, failures FROM captcha WHERE hash = ?", (key,)).fetchone()
+            failures = previous[1] if previous else 0
+            if previous and previous[0] == 1 and not success:
+                # The gap was right before, blame the offset or the drag
+                conn.execute("UPDATE captcha SET offset = ?, failures = ?, last_used = ? WHERE hash = ?",
+                             (offset, failures + (success is False), time.time(), key))
+                return
+            if success is False:
+                failures += 1
+                # Unknown until it failed often enough to be the image's fault
+                success = False if failures >= self.max_failures else None
+            elif success:
+                failures = 0
+            conn.execute(
+                "INSERT OR REPLACE INTO captcha (hash, gap_x, confidence, success, last_used, offset, failures) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, float(gap_x), float(confidence), None if success is None else int(success), time.time(), offset, failures),
+            )
+            conn.execute(
+                "DELETE FROM captcha WHERE hash NOT IN (SELECT hash FROM captcha ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def report(self):
+        if self.hits or self.misses:
+            logging.info(f"Captcha cache: {self.hits} hits, {self.misses} misses")
+        self.hits = 0
+        self.misses = 0
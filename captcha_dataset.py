@@ -0,0 +1,44 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+MANIFEST = "manifest.jsonl"
+
+
+class CaptchaDataset:
+    """
+    Opt-in capture of every captcha the spider slides on: the canvas image
+    plus one manifest.jsonl line with the prediction and the outcome.
+    gap_x (the label tools/eval_captcha.py scores against) is only set when
+    the slide logged in; predicted_x is always kept.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def save(self, image, solver, predicted_x, confidence, scale, offset, final_distance, success):
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.png"
+        try:
+            image.save(os.path.join(self.root, name), format="PNG", optimize=True)
+            entry = {
+                "image": name,
+                "gap_x": float(predicted_x) if success else None,
+                "predicted_x": float(predicted_x),
+                "confidence": round(float(confidence), 4),
+                "scale": round(scale, 4),
+                "offset": offset,
+                "final_distance": final_distance,
+                "success": success,
+                "solver": solver,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            with self._lock, open(os.path.join(self.root, MANIFEST), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logging.warning(f"Failed to save captcha sample: {e}")
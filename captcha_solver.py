@@ -1,3 +1,6 @@
+import logging
+import os
+
 from PIL import ImageDraw,Image,ImageOps
 import numpy as np
 import onnxruntime
@@ -6,11 +9,90 @@ anchors = [[(116,90),(156,198),(373,326)],[(30,61),(62,45),(59,119)],[(10,13),(1
 anchors_yolo_tiny = [[(81, 82), (135, 169), (344, 319)], [(10, 14), (23, 27), (37, 58)]]
 CLASSES=["target"]
 
+MODEL_SIZE = 416
+
+# CAPTCHA_MODEL_VARIANT -> model file next to this module
+MODEL_VARIANTS = {
+    "fp32": "captcha.onnx",
+    # Produced by tools/quantize_captcha.py
+    "int8": "captcha.int8.onnx",
+}
+
+GRAPH_OPT_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def resolve_model_path(variant="fp32", model_dir=os.path.dirname(os.path.abspath(__file__))):
+    """
+    Model file for a CAPTCHA_MODEL_VARIANT, falling back to fp32 when the variant has not been built
+    """
+    if variant not in MODEL_VARIANTS:
+        logging.warning(f"Unknown captcha model variant '{variant}', using fp32")
+        variant = "fp32"
+    path = os.path.join(model_dir, MODEL_VARIANTS[variant])
+    if variant != "fp32" and not os.path.exists(path):
+        logging.warning(f"Captcha model {path} not found (run tools/quantize_captcha.py), using fp32")
+        path = os.path.join(model_dir, MODEL_VARIANTS["fp32"])
+    return path
 
 
 class CaptchaResolver:
     def __init__(self, model_path="captcha.onnx"):
-        self.session = onnxruntime.InferenceSession(model_path) 
+        self.intra_op_threads = int(os.getenv("ORT_INTRA_OP_THREADS", 1))
+        self.inter_op_threads = int(os.getenv("ORT_INTER_OP_THREADS", 1))
+        self.graph_opt_level = os.getenv("ORT_GRAPH_OPT_LEVEL", "all").split('#')[0].strip().lower()
+        self.execution_mode = os.getenv("ORT_EXECUTION_MODE", "sequential").split('#')[0].strip().lower()
+        self.enable_model_cache = os.getenv("ORT_OPTIMIZED_MODEL_CACHE", "true").lower() == "true"
+
+        self.session = self._create_session(model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        # A fixed batch dimension (int) means one image per session.run
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self.dynamic_batch = not isinstance(batch_dim, int)
+        # Reused across calls to avoid allocating a new input tensor every time
+        self._input = np.empty((1, 3, MODEL_SIZE, MODEL_SIZE), dtype=np.float32)
+
+    def optimized_model_path(self, model_path):
+        root, ext = os.path.splitext(model_path)
+        return f"{root}.opt-{self.graph_opt_level}{ext}"
+
+    def _create_session(self, model_path):
+        """
+        Build the session from the ORT_* settings. The graph optimized at the
+        configured level is saved next to the model and loaded as-is on later
+        starts, so the optimization passes only run once per model file.
+        """
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+        options.graph_optimization_level = GRAPH_OPT_LEVELS[self.graph_opt_level]
+
+        cache_path = self.optimized_model_path(model_path)
+        if self.enable_model_cache and self.graph_opt_level != "disable":
+            if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+                # Already optimized, skip the passes
+                options.graph_optimization_level = GRAPH_OPT_LEVELS["disable"]
+                try:
+                    session = onnxruntime.InferenceSession(cache_path, options, providers=["CPUExecutionProvider"])
+                    logging.info(f"Loaded optimized captcha model from {cache_path}")
+                    return session
+                except Exception as e:
+                    logging.warning(f"Failed to load optimized captcha model {cache_path}, rebuilding: {e}")
+                    options.graph_optimization_level = GRAPH_OPT_LEVELS[self.graph_opt_level]
+            if os.access(os.path.dirname(os.path.abspath(cache_path)), os.W_OK):
+                options.optimized_model_filepath = cache_path
+                logging.info(f"Saving optimized captcha model to {cache_path}")
+
+        return onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
 
     def _sigmoid(self, x):
         return 1 / (1 + np.exp(-1 * x))
@@ -24,86 +106,83 @@ class CaptchaResolver:
         return y
 
     def _nms(self, dets, thresh):
-        x1 = dets[:, 0]
-        y1 = dets[:, 1]
-        x2 = dets[:, 2]
-        y2 = dets[:, 3]
-        areas = (y2 - y1 + 1) * (x2 - x1 + 1)
-        scores = dets[:, 4]
-        keep = []
-        index = scores.argsort()[::-1]
-
-        while index.size > 0:
-            i = index[0]
-            keep.append(i)
-            x11 = np.maximum(x1[i], x1[index[1:]])
-            y11 = np.maximum(y1[i], y1[index[1:]])
-            x22 = np.minimum(x2[i], x2[index[1:]])
-            y22 = np.minimum(y2[i], y2[index[1:]])
-
-            w = np.maximum(0, x22 - x11 + 1)
-            h = np.maximum(0, y22 - y11 + 1)
-
-            overlaps = w * h
-            ious = overlaps / (areas[i] + areas[index[1:]] - overlaps)
-            idx = np.where(ious <= thresh)[0]
-            index = index[idx + 1]
-        return keep
+        """
+        Fast NMS: a box is dropped when any higher-scoring box overlaps it
+        more than thresh. One IoU matrix instead of a shrinking-index loop.
+        """
+        order = dets[:, 4].argsort()[::-1]
+        boxes = dets[order, :4]
+        areas = (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+
+        x11 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+        y11 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+        x22 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+        y22 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+        overlaps = np.maximum(0, x22 - x11 + 1) * np.maximum(0, y22 - y11 + 1)
+        ious = overlaps / (areas[:, None] + areas[None, :] - overlaps)
+
+        # Only compare against higher-scoring boxes (strict upper triangle)
+        ious = np.triu(ious, k=1)
+        return order[ious.max(axis=0, initial=0) <= thresh]
 
     def process_boxes(self, prediction, conf_thres=0.7, nms_thres=0.6):
         feature_map = np.squeeze(prediction)
-        conf = feature_map[..., 4] > conf_thres
-        box = feature_map[conf == True]
-
-        cls_conf = box[..., 5:]
-        cls = []
-        for i in range(len(cls_conf)):
-            cls.append(int(np.argmax(cls_conf[i])))
-        all_cls = list(set(cls))
-
-        output = []
-        for i in range(len(all_cls)):
-            curr_cls = all_cls[i]
-            curr_cls_box = []
-            
-            for j in range(len(cls)):
-                if cls[j] == curr_cls:
-                    box[j][5] = curr_cls
-                    curr_cls_box.append(box[j][:6])
-
-            curr_cls_box = np.array(curr_cls_box)
-            curr_cls_box = self._xywh2xyxy(curr_cls_box)
-            curr_out_box = self._nms(curr_cls_box, nms_thres)
-
-            for k in curr_out_box:
-                output.append(curr_cls_box[k])
-        output = np.array(output)
-        return output
+        box = feature_map[feature_map[..., 4] > conf_thres]
+        if len(box) == 0:
+            return np.empty((0, 6), dtype=np.float32)
+
+        dets = self._xywh2xyxy(box[:, :6])
+        cls = np.argmax(box[:, 5:], axis=1)
+        dets[:, 5] = cls
+
+        # Per-class NMS in one pass: shift each class into its own coordinate range
+        offsets = (cls * (dets[:, :4].max() + 1))[:, None]
+        shifted = np.concatenate([dets[:, :4] + offsets, dets[:, 4:5]], axis=1)
+        return dets[self._nms(shifted, nms_thres)]
+
+    def _fill_input(self, image, out):
+        img = image.resize((MODEL_SIZE, MODEL_SIZE)).convert("RGB")
+        np.divide(np.asarray(img).transpose(2, 0, 1), 255.0, out=out)
 
     def predict(self, image):
-        org_img = image.resize((416, 416))
-        img = org_img.convert("RGB")
-        img = np.array(img).transpose(2, 0, 1)
-        img = img.astype(dtype=np.float32)
-        img /= 255.0
-        img = np.expand_dims(img, axis=0)
-
-        inputs = {self.session.get_inputs()[0].name: img}
-        prediction = self.session.run(None, inputs)[0]
+        self._fill_input(image, self._input[0])
+        prediction = self.session.run(None, {self.input_name: self._input[:1]})[0]
         return prediction
 
-    def solve_gap(self, image):
-        prediction = self.predict(image)
+    def predict_batch(self, images):
+        if not self.dynamic_batch:
+            return [self.predict(image) for image in images]
+
+        if self._input.shape[0] < len(images):
+            self._input = np.empty((len(images), 3, MODEL_SIZE, MODEL_SIZE), dtype=np.float32)
+        for i, image in enumerate(images):
+            self._fill_input(image, self._input[i])
+        predictions = self.session.run(None, {self.input_name: self._input[:len(images)]})[0]
+        return [predictions[i:i + 1] for i in range(len(images))]
+
+    def _decode(self, image, prediction):
         boxes = self.process_boxes(prediction=prediction)
         if len(boxes) == 0:
-            return 0
-        else:
-            # Calculate scaling ratio
-            original_width = image.size[0]
-            model_width = 416
-            scale_ratio = original_width / model_width
-            
-            x_coordinate = boxes[..., :4][0][0] # Keep as float
-            scaled_x = x_coordinate * scale_ratio
-            
-            return scaled_x
+            return 0, 0.0
+        # Calculate scaling ratio
+        scale_ratio = image.size[0] / MODEL_SIZE
+        x_coordinate = boxes[0][0] # Keep as float
+        return x_coordinate * scale_ratio, float(boxes[0][4])
+
+    def locate_gap(self, image, piece=None):
+        """
+        :param piece: Slider piece canvas, not used by the model
+        :return: (gap x position in image pixels, confidence 0-1); (0, 0.0) when nothing is found
+        """
+        return self._decode(image, self.predict(image))
+
+    def solve_gaps(self, images):
+        """
+        Locate the gap in several captcha images with one session.run when the
+        model accepts a dynamic batch
+        :return: List of (gap x position, confidence), one per image
+        """
+        return [self._decode(image, prediction) for image, prediction in zip(images, self.predict_batch(images))]
+
+    def solve_gap(self, image):
+        return self.locate_gap(image)[0]
@@ -0,0 +1,76 @@
+import logging
+import os
+import time
+
+SOLVER_TYPES = ("onnx", "classical", "vlm", "cascade")
+
+
+def build_resolver(solver_type):
+    """
+    Create the resolver for a CAPTCHA_SOLVER_TYPE. The ONNX solver falls back
+    to the classical one when onnxruntime or the model is unavailable.
+    """
+    if solver_type == "cascade":
+        tiers = [t.strip().lower() for t in os.getenv("CAPTCHA_CASCADE", "onnx,vlm").split('#')[0].split(",") if t.strip()]
+        tiers = [t for t in tiers if t in SOLVER_TYPES and t != "cascade"]
+        logging.info(f"Using Cascade Captcha Solver ({' -> '.join(tiers)})")
+        return CascadeCaptchaResolver([(t, build_resolver(t)) for t in tiers])
+
+    if solver_type == "vlm":
+        from vlm_solver import VLMCaptchaResolver
+        logging.info("Using VLM Captcha Solver")
+        return VLMCaptchaResolver()
+
+    if solver_type == "classical":
+        from classical_solver import ClassicalCaptchaResolver
+        logging.info("Using Classical Captcha Solver")
+        return ClassicalCaptchaResolver()
+
+    model_variant = os.getenv("CAPTCHA_MODEL_VARIANT", "fp32").split('#')[0].strip().lower()
+    try:
+        from captcha_solver import CaptchaResolver, resolve_model_path
+        resolver = CaptchaResolver(resolve_model_path(model_variant))
+        logging.info(f"Using ONNX Captcha Solver ({model_variant})")
+        return resolver
+    except Exception as e:
+        # onnxruntime not installed (e.g. no wheel for this platform) or model missing
+        from classical_solver import ClassicalCaptchaResolver
+        logging.warning(f"ONNX Captcha Solver unavailable ({e}), using Classical Captcha Solver")
+        return ClassicalCaptchaResolver()
+
+
+class CascadeCaptchaResolver:
+    """
+    Tries cheap local solvers first and only escalates (e.g. to the VLM)
+    while the answer so far is below CAPTCHA_MIN_CONFIDENCE
+    """
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self.threshold = float(os.getenv("CAPTCHA_MIN_CONFIDENCE", 0.8))
+        self.calls = {name: 0 for name, _ in tiers}
+
+    def locate_gap(self, image, piece=None):
+        """
+        :param piece: Slider piece canvas, passed on to every tier
+        :return: (gap x, confidence) of the first confident tier, else the most confident answer
+        """
+        best = (0, 0.0)
+        for name, resolver in self.tiers:
+            start = time.time()
+            try:
+                gap_x, confidence = resolver.locate_gap(image, piece)
+            except Exception as e:
+                logging.warning(f"Captcha tier '{name}' failed: {e}")
+                continue
+            finally:
+                self.calls[name] += 1
+            logging.info(f"Captcha tier '{name}': Gap={gap_x}, Confidence={confidence:.2f} ({time.time() - start:.2f}s)")
+            if confidence > best[1]:
+                best = (gap_x, confidence)
+            if confidence >= self.threshold:
+                break
+        return best
+
+    def solve_gap(self, image):
+        return self.locate_gap(image)[0]
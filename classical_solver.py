@@ -0,0 +1,82 @@
+import logging
+import os
+
+import cv2
+import numpy as np
+
+# Puzzle piece body of the 95598 slide captcha: 42px on a 310px wide canvas
+DEFAULT_PIECE_RATIO = 42 / 310
+
+
+class ClassicalCaptchaResolver:
+    """
+    Model-free gap detector: edge detection, a vertical-edge column profile
+    and template matching against the piece outline. Runs in a few
+    milliseconds and needs nothing but NumPy/OpenCV.
+    """
+
+    def __init__(self):
+        self.piece_ratio = float(os.getenv("CAPTCHA_PIECE_RATIO", DEFAULT_PIECE_RATIO))
+
+    def _edges(self, gray):
+        blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+        return cv2.Canny(blurred, 50, 150)
+
+    def _piece_template(self, piece, size):
+        """
+        Outline of the slider piece. Uses the real block canvas when given
+        (cropped to its opaque pixels), otherwise a square of the piece size.
+        """
+        if piece is not None:
+            rgba = np.asarray(piece.convert("RGBA"))
+            ys, xs = np.nonzero(rgba[..., 3] > 0)
+            if len(xs):
+                mask = (rgba[ys.min():ys.max() + 1, xs.min():xs.max() + 1, 3] > 0).astype(np.uint8) * 255
+                # A one pixel margin, like the square below, so the outline at the border is detected
+                return cv2.Canny(cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0), 50, 150)
+
+        template = np.zeros((size, size), dtype=np.uint8)
+        cv2.rectangle(template, (1, 1), (size - 2, size - 2), 255, 2)
+        return template
+
+    def locate_gap(self, image, piece=None):
+        """
+        :param image: PIL Image of the captcha background
+        :param piece: Optional PIL Image of the slider piece canvas
+        :return: (gap left edge x in image pixels, confidence 0-1); (0, 0.0) when nothing stands out
+        """
+        gray = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape
+        size = max(8, int(round(width * self.piece_ratio)))
+        edges = self._edges(gray)
+        template = self._piece_template(piece, size)
+        if template.shape[0] > height or template.shape[1] > width:
+            return 0, 0.0
+
+        # Best outline match per column, over all rows
+        match = cv2.matchTemplate(edges, template, cv2.TM_CCORR_NORMED).max(axis=0)
+
+        # Column profile of vertical edges: a gap has strong edges at x and x + size
+        vertical = np.abs(cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)).sum(axis=0)
+        vertical /= vertical.max() or 1
+        piece_width = template.shape[1]
+        profile = (vertical[:len(match)] + vertical[piece_width - 1:piece_width - 1 + len(match)]) / 2
+
+        score = match * profile
+        # The piece starts at the left border, the gap is never there
+        score[:size // 2] = 0
+        x = int(np.argmax(score))
+        best = score[x]
+        if best <= 0:
+            return 0, 0.0
+
+        # Confidence: how much the winner stands out from the best column outside its neighbourhood
+        others = score.copy()
+        others[max(0, x - size // 2):x + size // 2 + 1] = 0
+        runner_up = others.max()
+        confidence = float(np.clip(match[x] * (1 - runner_up / best) * 4, 0, 1))
+        logging.debug(f"Classical solver: x={x}, match={match[x]:.2f}, runner-up ratio={runner_up / best:.2f}")
+        return x, confidence
+
+    def solve_gap(self, image):
+        return self.locate_gap(image)[0]
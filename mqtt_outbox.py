@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils import data_path
+
+
+class MQTTOutbox:
+    """
+    Durable queue of MQTT publishes that have not been acknowledged yet.
+    Only the latest payload per topic is kept: a newer state replaces one
+    still waiting for the broker. Survives restarts in the data directory.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.path = data_path(os.getenv("MQTT_OUTBOX_DB", "mqtt_outbox.db"))
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS outbox (topic TEXT PRIMARY KEY, payload TEXT, config INTEGER, time REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def put(self, topic, payload, config=False):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO outbox (topic, payload, config, time) VALUES (?, ?, ?, ?)",
+                         (topic, payload, int(config), time.time()))
+
+    def pending(self):
+        """
+        :return: [(topic, payload, config)] oldest first
+        """
+        with self._lock, self._connect() as conn:
+            return [(topic, payload, bool(config)) for topic, payload, config in
+                    conn.execute("SELECT topic, payload, config FROM outbox ORDER BY time")]
+
+    def remove(self, delivered):
+        """
+        Drop delivered (topic, payload) pairs, unless a newer payload was queued for the topic meanwhile
+        """
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM outbox WHERE topic = ? AND payload = ?", delivered)
+
+    def __contains__(self, topic):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT 1 FROM outbox WHERE topic = ?", (topic,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
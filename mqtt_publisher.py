@@ -1,7 +1,11 @@
 import logging
 import os
 import json
+import threading
+import time
 import paho.mqtt.client as mqtt
+from mqtt_outbox import MQTTOutbox
+from publish_cache import PublishCache
 from settings import *
 
 class MQTTPublisher:
@@ -12,16 +16,33 @@ class MQTTPublisher:
         self.username = os.getenv("MQTT_USER", "")
         self.password = os.getenv("MQTT_PASSWORD", "")
         self.topic_prefix = os.getenv("MQTT_TOPIC_PREFIX", DEFAULT_MQTT_PREFIX)
+        self.birth_topic = f"{DEFAULT_DISCOVERY_PREFIX}/status"
+
+        # Skip configs and states that are already on the broker
+        self.publish_cache = None
+        if os.getenv("ENABLE_MQTT_PUBLISH_CACHE", "true").split('#')[0].strip().lower() == "true":
+            self.publish_cache = PublishCache()
+        # Unchanged states are still re-sent after this long, 0 sends them every run
+        self.state_refresh = float(os.getenv("MQTT_STATE_REFRESH_HOURS", 24)) * 3600
+
+        # Publishes wait here until the broker acknowledged them
+        self.outbox = MQTTOutbox()
+        self.ack_timeout = float(os.getenv("MQTT_ACK_TIMEOUT", 10))
+        self.flush_lock = threading.Lock()
         
         self.client = mqtt.Client()
         if self.username and self.password:
             self.client.username_pw_set(self.username, self.password)
             
         self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.message_callback_add(self.birth_topic, self.on_birth)
+        self.client.reconnect_delay_set(1, 60)
         
         try:
             logging.info(f"Attempting to connect to MQTT Broker: {self.broker}:{self.port}...")
-            self.client.connect(self.broker, self.port, 60)
+            # The network thread keeps retrying until the broker is reachable
+            self.client.connect_async(self.broker, self.port, 60)
             self.client.loop_start()
         except Exception as e:
             logging.error(f"Failed to initiate MQTT connection: {e}")
@@ -29,9 +50,90 @@ class MQTTPublisher:
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logging.info("Successfully connected to MQTT Broker!")
+            # Home Assistant announces a restart here, it then needs the discovery configs again
+            client.subscribe(self.birth_topic)
+            self._flush_in_background()
         else:
             logging.error(f"Failed to connect to MQTT Broker with return code {rc}")
 
+    def on_disconnect(self, client, userdata, rc):
+        if rc != 0:
+            logging.warning(f"Lost connection to MQTT Broker ({mqtt.error_string(rc)}), reconnecting")
+
+    def on_birth(self, client, userdata, message):
+        # A retained birth message is replayed on every subscribe, not a restart
+        if message.retain or message.payload.decode(errors="ignore").strip() != "online" or self.publish_cache is None:
+            return
+        configs = self.publish_cache.configs()
+        logging.info(f"Home Assistant is online, re-sending {len(configs)} discovery configs")
+        for topic, payload in configs:
+            self.outbox.put(topic, payload, config=True)
+        self._flush_in_background()
+
+    def _flush_in_background(self):
+        # Callbacks run on the network thread, which has to stay free to receive the acknowledgements
+        threading.Thread(target=self.flush, daemon=True).start()
+
+    def _queue(self, topic, payload, config=False):
+        """
+        Queue a retained payload in the outbox unless the broker already has it.
+
+        :return: True when the payload was queued
+        """
+        # A payload still waiting in the outbox is always replaced, even by one equal
+        # to what the broker last acknowledged, or the stale pending one would win
+        if (self.publish_cache and topic not in self.outbox
+                and self.publish_cache.is_current(topic, payload, None if config else self.state_refresh)):
+            return False
+        self.outbox.put(topic, payload, config)
+        return True
+
+    def flush(self):
+        """
+        Send everything in the outbox at QoS 1 and wait for all acknowledgements
+        together; acknowledged entries leave the outbox, the rest are retried
+        on the next flush or reconnect.
+
+        :return: Number of publishes still waiting for the broker
+        """
+        with self.flush_lock:
+            pending = self.outbox.pending()
+            if not pending:
+                return 0
+            if not self.client.is_connected():
+                logging.warning(f"MQTT Broker not connected, {len(pending)} messages kept in the outbox until it is")
+                return len(pending)
+
+            sent = []
+            for topic, payload, config in pending:
+                info = self.client.publish(topic, payload, qos=1, retain=True)
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    logging.warning(f"Failed to publish to {topic}: {mqtt.error_string(info.rc)}")
+                    break
+                sent.append((topic, payload, config, info))
+
+            deadline = time.time() + self.ack_timeout
+            delivered = []
+            for topic, payload, config, info in sent:
+                try:
+                    info.wait_for_publish(max(0.0, deadline - time.time()))
+                except (ValueError, RuntimeError):
+                    continue
+                if info.is_published():
+                    delivered.append((topic, payload, config))
+
+            self.outbox.remove([(topic, payload) for topic, payload, _ in delivered])
+            if self.publish_cache:
+                for topic, payload, config in delivered:
+                    self.publish_cache.record(topic, payload, config)
+
+            remaining = len(pending) - len(delivered)
+            if remaining:
+                logging.warning(f"MQTT Broker acknowledged {len(delivered)}/{len(pending)} messages, {remaining} kept in the outbox")
+            else:
+                logging.info(f"MQTT Broker acknowledged {len(delivered)} messages")
+            return remaining
+
     def publish_user_data(self, user_id: str, balance: float, last_daily_date: str, last_daily_usage: float, yearly_charge: float, yearly_usage: float, month_charge: float, month_usage: float):
         if balance is not None:
             self.publish_sensor(user_id, "balance", balance, UNIT_MONEY, "mdi:cash", "monetary", "total")
@@ -51,11 +153,16 @@ class MQTTPublisher:
         if month_charge is not None:
             self.publish_sensor(user_id, "month_charge", month_charge, UNIT_MONEY, "mdi:cash", "monetary", "measurement")
 
-        logging.info(f"User {user_id} data published to MQTT successfully!")
+        # One bulk delivery for all sensors of the user
+        if self.flush() == 0:
+            logging.info(f"User {user_id} data published to MQTT successfully!")
+        else:
+            logging.warning(f"User {user_id} data queued, it is published once the MQTT Broker is reachable")
 
     def publish_sensor(self, user_id, sensor_type, value, unit, icon, device_class, state_class, extra_attrs=None):
         """
-        Publish sensor data to MQTT and send Auto Discovery config
+        Queue sensor data and its Auto Discovery config for MQTT,
+        each only when it differs from what was last published
         """
         sensor_name = f"{sensor_type}_{user_id[-4:]}"
         unique_id = f"{user_id}_{sensor_type}"
@@ -80,9 +187,10 @@ class MQTTPublisher:
                 "sw_version": "1.0"
             }
         }
-        self.client.publish(config_topic, json.dumps(config_payload), retain=True)
+        self._queue(config_topic, json.dumps(config_payload), config=True)
         
         # 2. Publish State
-        self.client.publish(state_topic, str(value), retain=True)
-        
-        logging.info(f"Published {sensor_name}: {value} {unit}")
+        if self._queue(state_topic, str(value)):
+            logging.info(f"Queued {sensor_name}: {value} {unit}")
+        else:
+            logging.info(f"Unchanged {sensor_name}: {value} {unit}, not re-published")
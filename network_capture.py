@@ -0,0 +1,209 @@
+"""
+Harvest the JSON responses the portal's Vue frontend loads over XHR, using
+ChromeDriver performance logs (CDP Network events), and turn them into the
+same values the DOM scrapers return.
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from settings import *
+
+
+def enable_performance_logging(options):
+    """
+    Ask ChromeDriver to record CDP Network events into the 'performance' log
+    """
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def _to_float(value):
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize_date(value):
+    text = str(value)
+    if re.fullmatch(r"\d{8}", text):
+        return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    if re.fullmatch(r"\d{6}", text):
+        return f"{text[:4]}-{text[4:]}"
+    return text
+
+
+def _first_key(item, keys):
+    for key in keys:
+        if key in item and item[key] not in (None, ""):
+            return item[key]
+    return None
+
+
+def _unwrap(payload):
+    """
+    Strip response envelopes such as {"code": 0, "data": {...}}
+    """
+    while isinstance(payload, dict):
+        inner = _first_key(payload, NETWORK_ENVELOPE_KEYS)
+        if not isinstance(inner, (dict, list)):
+            break
+        payload = inner
+    return payload
+
+
+def _matches(url, fragments):
+    return any(fragment in url for fragment in fragments)
+
+
+def _records(payload, list_keys):
+    """
+    The list of row dicts in an endpoint's payload, either the payload itself or under one of list_keys
+    """
+    rows = _first_key(payload, list_keys) if isinstance(payload, dict) else payload
+    return [row for row in rows if isinstance(row, dict)] if isinstance(rows, list) else []
+
+
+def parse_responses(responses):
+    """
+    Parse captured (url, payload) responses, oldest first. Each payload is
+    only read as the endpoint its URL matches; later responses of the same
+    endpoint override earlier ones, so the most recently selected account wins.
+    :return: dict with any of balance, yearly, months (with their year), days
+    """
+    result = {}
+    for url, payload in responses:
+        payload = _unwrap(payload)
+        if _matches(url, NETWORK_URLS_BALANCE) and isinstance(payload, dict):
+            balance = _to_float(_first_key(payload, NETWORK_KEYS_BALANCE))
+            if balance is not None:
+                result["balance"] = balance
+
+        elif _matches(url, NETWORK_URLS_YEARLY):
+            if isinstance(payload, dict):
+                year_usage = _to_float(_first_key(payload, NETWORK_KEYS_YEAR_USAGE))
+                year_charge = _to_float(_first_key(payload, NETWORK_KEYS_YEAR_CHARGE))
+                if year_usage is not None and year_charge is not None:
+                    result["yearly"] = (year_usage, year_charge)
+
+            months = []
+            for item in _records(payload, NETWORK_KEYS_MONTH_LIST):
+                month = _first_key(item, NETWORK_KEYS_MONTH)
+                month_usage = _to_float(_first_key(item, NETWORK_KEYS_MONTH_USAGE))
+                month_charge = _to_float(_first_key(item, NETWORK_KEYS_MONTH_CHARGE))
+                if month is not None and month_usage is not None and month_charge is not None:
+                    months.append((_normalize_date(month), month_usage, month_charge))
+            if months:
+                # Oldest first, like the monthly table on the page
+                result["months"] = sorted(months)
+                # The year the page loaded, the caller checks it is the one it reports
+                result["year"] = int(result["months"][-1][0][:4])
+
+        elif _matches(url, NETWORK_URLS_DAILY):
+            days = []
+            for item in _records(payload, NETWORK_KEYS_DAY_LIST):
+                day = _first_key(item, NETWORK_KEYS_DAY_DATE)
+                day_usage = _to_float(_first_key(item, NETWORK_KEYS_DAY_USAGE))
+                if day is not None and day_usage is not None:
+                    days.append((_normalize_date(day), day_usage))
+            if days:
+                # Newest first, like the daily table on the page
+                result["days"] = sorted(days, reverse=True)
+    return result
+
+
+class NetworkCapture:
+    def __init__(self, driver, dump_dir=None):
+        self.driver = driver
+        self.dump_dir = dump_dir
+        self.pending = {}
+        self.payloads = []
+        if self.dump_dir:
+            os.makedirs(self.dump_dir, exist_ok=True)
+
+    def start(self):
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.reset()
+
+    def reset(self):
+        """
+        Drop everything captured so far (e.g. before switching pages)
+        """
+        self._drain()
+        self.pending.clear()
+        self.payloads = []
+
+    def collect(self):
+        """
+        Parse every matching response seen since the last call
+        """
+        self._drain()
+        parsed = parse_responses(self.payloads)
+        self.payloads = []
+        return parsed
+
+    def _drain(self):
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            logging.debug(f"Failed to read performance log: {e}")
+            return
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                url = response.get("url", "")
+                if "json" in response.get("mimeType", "") and any(p in url for p in NETWORK_CAPTURE_URL_PATTERNS):
+                    self.pending[params.get("requestId")] = url
+            elif method == "Network.loadingFinished":
+                url = self.pending.pop(params.get("requestId"), None)
+                if url:
+                    self._fetch_body(params.get("requestId"), url)
+
+    def _fetch_body(self, request_id, url):
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            payload = json.loads(body.get("body", ""))
+        except Exception as e:
+            logging.debug(f"Failed to read response body of {url}: {e}")
+            return
+
+        self.payloads.append((url, payload))
+        logging.debug(f"Captured JSON response: {url}")
+        if self.dump_dir:
+            path = os.path.join(self.dump_dir, f"{time.time():.6f}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "body": payload}, f, ensure_ascii=False)
+
+
+def load_dump(dump_dir):
+    """
+    Load (url, payload) responses written by NETWORK_CAPTURE_DUMP_DIR, in capture order
+    """
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(dump_dir, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+            payloads.append((entry["url"], entry["body"]))
+    return payloads
+
+
+if __name__ == "__main__":
+    # Offline check of the parser against a recorded dump:
+    #   python3 network_capture.py ./errors/network
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <dump_dir>")
+        sys.exit(1)
+    print(json.dumps(parse_responses(load_dump(sys.argv[1])), ensure_ascii=False, indent=2))
@@ -0,0 +1,89 @@
+"""
+Tracks where the browser currently is (page, selected account, active tab,
+selected year) so SGCCSpider only performs the transitions it actually needs.
+"""
+
+import logging
+from datetime import datetime
+
+from selenium.webdriver.common.by import By
+
+XPATH_TABS = {
+    "first": "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']",
+    "second": "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']",
+}
+XPATH_YEAR_PICKER = '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input'
+# An option of the picker's dropdown list showing exactly this year, not any date on the page
+XPATH_YEAR_OPTION = "//ul/li/span[normalize-space(text())='{year}']"
+
+
+class PageNavigator:
+    def __init__(self, spider, driver):
+        self.spider = spider
+        self.driver = driver
+        self.skipped = 0
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Forget everything, e.g. after the driver navigated on its own
+        """
+        self.url = None
+        self.account = None
+        self.tab = None
+        self.year = None
+
+    def goto(self, url):
+        if self.url == url:
+            self.skipped += 1
+            return False
+        self.driver.get(url)
+        self.spider.waiter.network_idle(self.driver, f"page {url.rsplit('/', 1)[-1]}")
+        self.url = url
+        # A fresh page shows the default account, tab and the current year
+        self.account = None
+        self.tab = None
+        self.year = datetime.now().year
+        return True
+
+    def select_user(self, index):
+        if self.account == index:
+            self.skipped += 1
+            return False
+        self.spider.select_user(self.driver, index)
+        self.spider.waiter.network_idle(self.driver, "user switch")
+        self.account = index
+        # The page reloads for the account: the tab is selected again when
+        # needed, the year is back to the default unless we picked another one,
+        # in which case it is not known whether the picker kept it
+        self.tab = None
+        current_year = datetime.now().year
+        self.year = current_year if self.year == current_year else None
+        return True
+
+    def open_tab(self, tab):
+        if self.tab == tab:
+            self.skipped += 1
+            return False
+        self.spider._click_element(self.driver, By.XPATH, XPATH_TABS[tab])
+        self.spider.waiter.network_idle(self.driver, f"tab {tab}")
+        self.tab = tab
+        return True
+
+    def select_year(self, year):
+        if self.year == year:
+            self.skipped += 1
+            return False
+        self.open_tab("first")
+        self.spider._click_element(self.driver, By.XPATH, XPATH_YEAR_PICKER)
+        year_xpath = XPATH_YEAR_OPTION.format(year=year)
+        self.spider.waiter.element(self.driver, "year picker", By.XPATH, year_xpath)
+        self.driver.find_element(By.XPATH, year_xpath).click()
+        self.spider.waiter.network_idle(self.driver, "year switch")
+        self.year = year
+        return True
+
+    def report(self):
+        if self.skipped:
+            logging.info(f"Navigator skipped {self.skipped} redundant transitions")
+        self.skipped = 0
@@ -0,0 +1,54 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from utils import data_path
+
+
+def digest(payload):
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class PublishCache:
+    """
+    Digest of the last payload published per MQTT topic, so unchanged
+    discovery configs and states are not sent again. Discovery configs also
+    keep their payload so they can be re-sent when Home Assistant restarts.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.path = data_path(os.getenv("MQTT_PUBLISH_CACHE_DB", "mqtt_publish_cache.db"))
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS published (topic TEXT PRIMARY KEY, digest TEXT, config TEXT, time REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def is_current(self, topic, payload, max_age=None):
+        """
+        :return: True when `payload` is what was last published on `topic`,
+                 less than `max_age` seconds ago (any age when None)
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT digest, time FROM published WHERE topic = ?", (topic,)).fetchone()
+        if row is None or row[0] != digest(payload):
+            return False
+        return max_age is None or time.time() - row[1] < max_age
+
+    def record(self, topic, payload, config=False):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO published (topic, digest, config, time) VALUES (?, ?, ?, ?)",
+                (topic, digest(payload), payload if config else None, time.time()),
+            )
+
+    def configs(self):
+        """
+        :return: [(topic, payload)] of every discovery config published so far
+        """
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT topic, config FROM published WHERE config IS NOT NULL").fetchall()
@@ -1,15 +1,103 @@
+import base64
+import json
+import struct
 import cv2
 import numpy as np
 import threading
 import time
 import logging
 import os
+from collections import deque
+from urllib.request import urlopen
+
+import websocket
+
+
+def create_recorder(driver, output_path, fps=5.0):
+    """
+    Recorder for RECORDER_BACKEND: 'screencast' (JPEG frames pushed by the
+    browser over its own DevTools connection) or 'screenshot' (WebDriver PNG
+    polling). Falls back to 'screenshot' when no DevTools address is exposed.
+
+    RECORDER_MODE 'ring' keeps the recent frames in memory and only writes a
+    video when flush() is called; 'disk' writes every frame to output_path.
+    """
+    backend = os.getenv("RECORDER_BACKEND", "screencast").split('#')[0].strip().lower()
+    mode = os.getenv("RECORDER_MODE", "ring").split('#')[0].strip().lower()
+    ring = None
+    if mode == "ring":
+        ring = FrameRing(float(os.getenv("RECORDER_RING_SECONDS", 60)), float(os.getenv("RECORDER_RING_MAX_MB", 32)))
+
+    if backend == "screencast":
+        address = ScreencastRecorder.debugger_address(driver)
+        if address:
+            return ScreencastRecorder(driver, output_path, fps, address, ring=ring)
+        logging.warning("Browser exposes no DevTools address, recording with screenshots")
+    return ScreenRecorder(driver, output_path, fps, ring=ring)
+
+
+class FrameRing:
+    """
+    The last `seconds` of JPEG frames, capped at `max_mb` of memory.
+    A frame repeated while the page is idle is the same bytes object and is
+    only counted once.
+    """
+
+    # Nested handlers often report the same failure, flush it only once
+    MIN_FLUSH_INTERVAL = 1.0
+
+    def __init__(self, seconds=60.0, max_mb=32.0):
+        self.seconds = seconds
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.frames = deque()
+        self.bytes = 0
+        self.last_flush = 0.0
+        self.lock = threading.Lock()
+
+    def append(self, jpeg, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            size = 0 if self.frames and self.frames[-1][1] is jpeg else len(jpeg)
+            self.frames.append((timestamp, jpeg, size))
+            self.bytes += size
+            while self.frames and (self.bytes > self.max_bytes or timestamp - self.frames[0][0] > self.seconds):
+                self.bytes -= self.frames.popleft()[2]
+                # The next frame may be a repeat that was counted as free
+                if self.frames and self.frames[0][2] == 0:
+                    _, frame, _ = self.frames[0]
+                    self.frames[0] = (self.frames[0][0], frame, len(frame))
+                    self.bytes += len(frame)
+
+    def dump(self, path, fps):
+        """
+        Write the buffered frames to an MJPEG AVI.
+
+        :return: The path written, or None when there was nothing new to write
+        """
+        with self.lock:
+            now = time.time()
+            if not self.frames or now - self.last_flush < self.MIN_FLUSH_INTERVAL:
+                return None
+            self.last_flush = now
+            frames = [frame for _, frame, _ in self.frames]
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        writer = MJPEGAviWriter(path, fps)
+        try:
+            for frame in frames:
+                writer.write(frame)
+        finally:
+            writer.close()
+        return path
+
 
 class ScreenRecorder:
-    def __init__(self, driver, output_path, fps=5.0):
+    def __init__(self, driver, output_path, fps=5.0, ring=None):
         self.driver = driver
         self.output_path = output_path
         self.fps = fps
+        self.ring = ring
+        self.quality = int(os.getenv("RECORDER_JPEG_QUALITY", 60))
         self.stop_event = threading.Event()
         self.thread = None
         self.logger = logging.getLogger(__name__)
@@ -18,19 +106,35 @@ class ScreenRecorder:
         self.stop_event.clear()
         self.thread = threading.Thread(target=self._record_loop)
         self.thread.start()
-        self.logger.info(f"Started screen recording to {self.output_path}")
+        if self.ring:
+            self.logger.info(f"Started screen recording to memory (last {self.ring.seconds:g}s)")
+        else:
+            self.logger.info(f"Started screen recording to {self.output_path}")
 
     def stop(self):
         if self.thread and self.thread.is_alive():
             self.stop_event.set()
             self.thread.join()
-            self.logger.info(f"Stopped screen recording. Saved to {self.output_path}")
+            if self.ring:
+                self.logger.info("Stopped screen recording")
+            else:
+                self.logger.info(f"Stopped screen recording. Saved to {self.output_path}")
+
+    def flush(self, reason="failure"):
+        """
+        Write the buffered frames next to output_path, tagged with `reason`.
+        In disk mode everything is already in output_path.
+        """
+        if self.ring is None:
+            return self.output_path
+        return _flush_ring(self.ring, self.output_path, self.fps, reason, self.logger)
 
     def _record_loop(self):
         video_writer = None
         
         # Ensure directory exists
-        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        if self.ring is None:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
 
         try:
             while not self.stop_event.is_set():
@@ -47,14 +151,19 @@ class ScreenRecorder:
                     if img is None:
                         continue
 
-                    # Initialize video writer on first frame
-                    if video_writer is None:
-                        height, width, _ = img.shape
-                        # MJPG is more compatible in headless docker
-                        fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-                        video_writer = cv2.VideoWriter(self.output_path, fourcc, self.fps, (width, height))
-                    
-                    video_writer.write(img)
+                    if self.ring is not None:
+                        ok, jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                        if ok:
+                            self.ring.append(jpeg.tobytes())
+                    else:
+                        # Initialize video writer on first frame
+                        if video_writer is None:
+                            height, width, _ = img.shape
+                            # MJPG is more compatible in headless docker
+                            fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+                            video_writer = cv2.VideoWriter(self.output_path, fourcc, self.fps, (width, height))
+                        
+                        video_writer.write(img)
                     
                 except Exception as e:
                     self.logger.warning(f"Error capturing frame: {e}")
@@ -67,3 +176,224 @@ class ScreenRecorder:
         finally:
             if video_writer:
                 video_writer.release()
+
+
+def _flush_ring(ring, output_path, fps, reason, logger):
+    path = ring.dump(f"{os.path.splitext(output_path)[0]}_{reason}.avi", fps)
+    if path:
+        logger.info(f"Saved recording of the last {ring.seconds:g}s to {path}")
+    return path
+
+
+def jpeg_size(data):
+    """
+    (width, height) from a JPEG's SOF marker, without decoding it
+    """
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+class MJPEGAviWriter:
+    """
+    Minimal Motion-JPEG AVI writer that stores JPEG frames as they are, so
+    frames already compressed by the browser are never decoded or re-encoded.
+    Plays in the same players as the cv2 MJPG output.
+    """
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.file = None
+        self.index = []
+        self.size = None
+        self.max_frame = 0
+
+    def _chunk_header(self, fourcc, size):
+        return fourcc + struct.pack("<I", size)
+
+    def _open(self, width, height):
+        self.size = (width, height)
+        self.file = open(self.path, "wb")
+        avih = struct.pack("<14I", int(1000000 / self.fps), 0, 0, 0x10, 0, 0, 1, 0, width, height, 0, 0, 0, 0)
+        strh = b"vidsMJPG" + struct.pack("<IHHIIIIIIiI4h", 0, 0, 0, 0, 1000, int(self.fps * 1000), 0, 0, 0, -1, 0, 0, 0, width, height)
+        strf = struct.pack("<IiiHH4sIiiII", 40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0)
+        strl = b"strl" + self._chunk_header(b"strh", len(strh)) + strh + self._chunk_header(b"strf", len(strf)) + strf
+        hdrl = b"hdrl" + self._chunk_header(b"avih", len(avih)) + avih + self._chunk_header(b"LIST", len(strl)) + strl
+
+        self.file.write(self._chunk_header(b"RIFF", 0) + b"AVI ")
+        self.file.write(self._chunk_header(b"LIST", len(hdrl)) + hdrl)
+        self.movi_start = self.file.tell()
+        self.file.write(self._chunk_header(b"LIST", 0) + b"movi")
+
+    def write(self, jpeg):
+        if self.file is None:
+            size = jpeg_size(jpeg)
+            if size is None:
+                return
+            self._open(*size)
+        # idx1 offsets are relative to the 'movi' fourcc
+        self.index.append((self.file.tell() - self.movi_start - 8, len(jpeg)))
+        self.file.write(self._chunk_header(b"00dc", len(jpeg)) + jpeg)
+        if len(jpeg) % 2:
+            self.file.write(b"\0")
+        self.max_frame = max(self.max_frame, len(jpeg))
+
+    def close(self):
+        if self.file is None:
+            return
+        movi_end = self.file.tell()
+        self.file.write(self._chunk_header(b"idx1", 16 * len(self.index)))
+        for offset, length in self.index:
+            self.file.write(b"00dc" + struct.pack("<III", 0x10, offset, length))
+        riff_end = self.file.tell()
+
+        # Patch sizes and frame counts now that they are known
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", riff_end - 8))
+        self.file.seek(32 + 16)
+        self.file.write(struct.pack("<I", len(self.index)))
+        self.file.seek(32 + 28)
+        self.file.write(struct.pack("<I", self.max_frame))
+        strh_start = 32 + 56 + 12 + 8
+        self.file.seek(strh_start + 32)
+        self.file.write(struct.pack("<II", len(self.index), self.max_frame))
+        self.file.seek(self.movi_start + 4)
+        self.file.write(struct.pack("<I", movi_end - self.movi_start - 8))
+        self.file.close()
+        self.file = None
+
+
+class ScreencastRecorder:
+    """
+    Records through Page.startScreencast on a separate DevTools connection:
+    the browser pushes compressed JPEG frames, so recording neither competes
+    with the scraping thread for the WebDriver session nor decodes images.
+    The latest frame is written (or buffered in `ring`) once per 1/fps tick.
+    """
+
+    def __init__(self, driver, output_path, fps=5.0, address=None, ring=None):
+        self.driver = driver
+        self.output_path = output_path
+        self.fps = fps
+        self.ring = ring
+        self.address = address or self.debugger_address(driver)
+        self.quality = int(os.getenv("RECORDER_JPEG_QUALITY", 60))
+        self.max_width = int(os.getenv("RECORDER_MAX_WIDTH", 1280))
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.ws = None
+        self.fallback = None
+        self.frames = 0
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def debugger_address(driver):
+        for key, value in getattr(driver, "capabilities", {}).items():
+            if key.endswith("Options") and isinstance(value, dict) and value.get("debuggerAddress"):
+                return value["debuggerAddress"]
+        return None
+
+    def _page_target(self):
+        with urlopen(f"http://{self.address}/json", timeout=5) as response:
+            targets = [t for t in json.load(response) if t.get("type") == "page"]
+        try:
+            current = self.driver.current_url
+            return next(t for t in targets if t.get("url") == current)
+        except StopIteration:
+            return targets[0]
+
+    def _send(self, message_id, method, params=None):
+        self.ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+
+    def start(self):
+        self.stop_event.clear()
+        try:
+            target = self._page_target()
+            self.ws = websocket.create_connection(target["webSocketDebuggerUrl"], timeout=5, suppress_origin=True)
+            self._send(1, "Page.startScreencast", {"format": "jpeg", "quality": self.quality, "maxWidth": self.max_width, "maxHeight": self.max_width, "everyNthFrame": 1})
+        except Exception as e:
+            self.logger.warning(f"Failed to start screencast recording ({e}), recording with screenshots")
+            self.ws = None
+            self.fallback = ScreenRecorder(self.driver, self.output_path, self.fps, ring=self.ring)
+            self.fallback.start()
+            return
+        self.thread = threading.Thread(target=self._record_loop, daemon=True)
+        self.thread.start()
+        if self.ring:
+            self.logger.info(f"Started screencast recording to memory (last {self.ring.seconds:g}s)")
+        else:
+            self.logger.info(f"Started screencast recording to {self.output_path}")
+
+    def stop(self):
+        if self.fallback:
+            self.fallback.stop()
+        if self.thread and self.thread.is_alive():
+            self.stop_event.set()
+            self.thread.join()
+            if self.ring:
+                self.logger.info(f"Stopped screen recording ({self.frames} frames)")
+            else:
+                self.logger.info(f"Stopped screen recording ({self.frames} frames). Saved to {self.output_path}")
+
+    def flush(self, reason="failure"):
+        """
+        Write the buffered frames next to output_path, tagged with `reason`.
+        In disk mode everything is already in output_path.
+        """
+        if self.ring is None:
+            return self.output_path
+        return _flush_ring(self.ring, self.output_path, self.fps, reason, self.logger)
+
+    def _record_loop(self):
+        writer = None
+        if self.ring is None:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+            writer = MJPEGAviWriter(self.output_path, self.fps)
+        latest = None
+        interval = 1.0 / self.fps
+        next_tick = time.time()
+        self.ws.settimeout(interval / 2)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    message = json.loads(self.ws.recv())
+                    if message.get("method") == "Page.screencastFrame":
+                        params = message["params"]
+                        latest = base64.b64decode(params["data"])
+                        # The browser sends the next frame only after this ack
+                        self._send(2, "Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+                except websocket.WebSocketTimeoutException:
+                    pass
+                except Exception as e:
+                    self.logger.warning(f"Screencast connection lost: {e}")
+                    break
+
+                # Repeat the latest frame while the page is not repainting
+                while latest is not None and time.time() >= next_tick:
+                    if writer:
+                        writer.write(latest)
+                    else:
+                        self.ring.append(latest, next_tick)
+                    self.frames += 1
+                    next_tick += interval
+        finally:
+            try:
+                self._send(3, "Page.stopScreencast")
+                self.ws.close()
+            except Exception:
+                pass
+            if writer:
+                writer.close()
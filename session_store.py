@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import re
+import time
+from urllib.parse import urlparse
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+
+from settings import *
+from utils import data_path
+
+JS_DUMP_STORAGE = """
+    var dump = function(storage) {
+        var items = {};
+        for (var i = 0; i < storage.length; i++) {
+            var key = storage.key(i);
+            items[key] = storage.getItem(key);
+        }
+        return items;
+    };
+    return {local: dump(window.localStorage), session: dump(window.sessionStorage)};
+"""
+
+JS_LOAD_STORAGE = """
+    var local = arguments[0], session = arguments[1];
+    Object.keys(local).forEach(function(k) { window.localStorage.setItem(k, local[k]); });
+    Object.keys(session).forEach(function(k) { window.sessionStorage.setItem(k, session[k]); });
+"""
+
+
+class SessionStore:
+    """
+    Persist the logged-in browser state (cookies, localStorage, sessionStorage)
+    so the next run can skip the login form and the captcha.
+    """
+
+    def __init__(self, username):
+        safe_name = re.sub(r"[^0-9A-Za-z_-]", "_", username)
+        self.path = data_path(f"session_{safe_name}.json")
+        self.max_age = int(os.getenv("SESSION_MAX_AGE_HOURS", 72)) * 3600
+
+    def save(self, driver):
+        try:
+            storage = driver.execute_script(JS_DUMP_STORAGE)
+            state = {
+                "saved_at": time.time(),
+                "origin": self._origin(driver.current_url),
+                "cookies": driver.get_cookies(),
+                "local_storage": storage.get("local", {}),
+                "session_storage": storage.get("session", {}),
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            logging.info(f"Saved browser session ({len(state['cookies'])} cookies) to {self.path}")
+        except Exception as e:
+            logging.warning(f"Failed to save browser session: {e}")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            logging.warning(f"Failed to read browser session {self.path}: {e}")
+            return None
+
+        if time.time() - state.get("saved_at", 0) > self.max_age:
+            logging.info("Stored browser session is too old, ignoring it.")
+            return None
+        return state
+
+    def restore(self, driver):
+        """
+        Load the stored state into the driver. The driver must be able to open
+        the portal origin because cookies and storage are scoped to it.
+        """
+        state = self.load()
+        if not state:
+            return False
+
+        try:
+            driver.get(URL_LOGIN)
+            for cookie in state.get("cookies", []):
+                cookie = {k: v for k, v in cookie.items() if k in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")}
+                if "expiry" in cookie:
+                    cookie["expiry"] = int(cookie["expiry"])
+                if cookie.get("sameSite") not in ("Strict", "Lax", "None"):
+                    cookie.pop("sameSite", None)
+                try:
+                    driver.add_cookie(cookie)
+                except Exception as e:
+                    logging.debug(f"Skipped cookie {cookie.get('name')}: {e}")
+
+            driver.execute_script(JS_LOAD_STORAGE, state.get("local_storage", {}), state.get("session_storage", {}))
+            logging.info(f"Restored browser session saved at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state['saved_at']))}")
+            return True
+        except Exception as e:
+            logging.warning(f"Failed to restore browser session: {e}")
+            return False
+
+    def is_valid(self, driver, timeout, implicit_wait):
+        """
+        Cheap probe: open the balance page and see whether the portal keeps us
+        there (account dropdown rendered) or bounces us back to the login page.
+        """
+        driver.implicitly_wait(0)
+        try:
+            driver.get(URL_BALANCE)
+            WebDriverWait(driver, timeout).until(
+                lambda d: d.current_url.startswith(URL_LOGIN) or d.find_elements(By.CLASS_NAME, "el-dropdown")
+            )
+            return not driver.current_url.startswith(URL_LOGIN)
+        except Exception:
+            return False
+        finally:
+            driver.implicitly_wait(implicit_wait)
+
+    def clear(self):
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except Exception as e:
+            logging.warning(f"Failed to remove browser session {self.path}: {e}")
+
+    def _origin(self, url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
@@ -1,9 +1,11 @@
 # SGCC Electricity Spider Settings
+import os
 
-# URLs
-URL_LOGIN = "https://95598.cn/osgweb/login"
-URL_USAGE = "https://95598.cn/osgweb/electricityCharge"
-URL_BALANCE = "https://95598.cn/osgweb/userAcc"
+# URLs (SGCC_BASE_URL points the spider at another host, e.g. tools/fake_portal)
+SGCC_BASE_URL = os.getenv("SGCC_BASE_URL", "https://95598.cn").rstrip("/")
+URL_LOGIN = f"{SGCC_BASE_URL}/osgweb/login"
+URL_USAGE = f"{SGCC_BASE_URL}/osgweb/electricityCharge"
+URL_BALANCE = f"{SGCC_BASE_URL}/osgweb/userAcc"
 
 # MQTT Defaults
 DEFAULT_MQTT_PREFIX = "95598"
@@ -15,3 +17,41 @@ DEFAULT_COMPONENT = "sensor"
 UNIT_MONEY = "CNY"
 UNIT_ENERGY = "kWh"
 
+# Network capture (EXTRACTION_MODE=network)
+# Only XHR responses whose URL contains one of these fragments are kept
+NETWORK_CAPTURE_URL_PATTERNS = ["/api/"]
+
+# Each response is parsed only as the endpoint whose URL fragment it matches,
+# so unrelated payloads (notices, user info) cannot override the values.
+# The fragments and keys below follow tools/fake_portal and have not been
+# checked against live portal traffic yet: record a dump with
+# NETWORK_CAPTURE_DUMP_DIR and adjust them if they differ.
+NETWORK_URLS_BALANCE = ["/api/balance"]
+NETWORK_URLS_YEARLY = ["/api/yearly"]
+NETWORK_URLS_DAILY = ["/api/daily"]
+# Days the daily tab loads by default; other DATA_RETENTION_DAYS are read from the page
+NETWORK_DEFAULT_DAILY_DAYS = 7
+
+# Wrappers around the actual data, e.g. {"code": 0, "data": {...}}
+NETWORK_ENVELOPE_KEYS = ["data", "result", "rtnData"]
+
+# JSON keys read from the matching endpoint, first present key wins
+NETWORK_KEYS_BALANCE = ["sumMoney", "prepayBal", "accountBalance"]
+NETWORK_KEYS_YEAR_USAGE = ["totalEleNum", "yearEleNum", "yearTotalPq"]
+NETWORK_KEYS_YEAR_CHARGE = ["totalEleCost", "yearEleCost", "yearTotalAmt"]
+NETWORK_KEYS_MONTH_LIST = ["monthList", "mothEleList"]
+NETWORK_KEYS_MONTH = ["month", "ym", "yearMonth"]
+NETWORK_KEYS_MONTH_USAGE = ["monthEleNum", "monthPq"]
+NETWORK_KEYS_MONTH_CHARGE = ["monthEleCost", "monthAmt"]
+NETWORK_KEYS_DAY_LIST = ["dayList", "sevenEleList"]
+NETWORK_KEYS_DAY_DATE = ["day", "ymd"]
+NETWORK_KEYS_DAY_USAGE = ["dayElePq", "dayPq"]
+
+# Lean browser profile (LEAN_BROWSER=true): requests dropped via Network.setBlockedURLs.
+# PNG is left alone because the slide captcha background is drawn from it.
+LEAN_BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.m4a",
+    "*hm.baidu.com*", "*cnzz.com*", "*google-analytics.com*", "*googletagmanager.com*", "*growingio.com*",
+]
@@ -6,23 +6,57 @@ import time
 import random
 import base64
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 import platform
-import numpy as np
 from io import BytesIO
 from PIL import Image
 from selenium import webdriver
-from selenium.webdriver import ActionChains
+from selenium.webdriver.common.actions import interaction
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.webdriver.common.actions.mouse_button import MouseButton
+from selenium.webdriver.common.actions.pointer_input import PointerInput
 from selenium.webdriver.edge.service import Service as EdgeService
 from webdriver_manager.microsoft import EdgeChromiumDriverManager
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
 from mqtt_publisher import MQTTPublisher
-from utils import ScreenshotOnFailure
+from utils import ScreenshotOnFailure, StageTimer, data_path, process_tree_cpu_seconds, process_tree_rss_mb
+from session_store import SessionStore
+from network_capture import NetworkCapture, enable_performance_logging
+from waits import PageWaiter, JS_TRACK_REQUESTS
+from page_navigator import PageNavigator
+from cascade_solver import build_resolver
+from captcha_cache import CaptchaCache, dhash
+from captcha_dataset import CaptchaDataset
+from slider_calibration import SliderCalibration
 from settings import *
-from captcha_solver import CaptchaResolver
+
+XPATH_MONTHLY_ROWS = "//*[@id='pane-first']/div[1]/div[2]/div[2]/div/div[3]/table/tbody/tr"
+XPATH_DAILY_ROWS = "//*[@id='pane-second']/div[2]/div[2]/div[1]/div[3]/table/tbody/tr"
+XPATH_DAILY_RANGE_INPUTS = "//*[@id='pane-second']//input[contains(@class, 'el-range-input')]"
+
+# Reads a whole table in one round trip: [[label, number, number, ...], ...]
+JS_READ_TABLE = """
+    var rows = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var toNumber = function(text) {
+        var n = parseFloat(text.replace(/,/g, ''));
+        return isNaN(n) ? null : n;
+    };
+    var table = [];
+    for (var i = 0; i < rows.snapshotLength; i++) {
+        var cells = rows.snapshotItem(i).querySelectorAll('td');
+        if (!cells.length) continue;
+        var texts = Array.prototype.map.call(cells, function(td) {
+            return td.textContent.replace('MAX', '').trim();
+        });
+        table.push([texts[0]].concat(texts.slice(1).map(toNumber)));
+    }
+    return table;
+"""
 
 def base64_to_image(base64_str: str):
     base64_data = re.sub('^data:image/.+;base64,', '', base64_str)
@@ -32,6 +66,11 @@ def base64_to_image(base64_str: str):
     return img
 
 class SGCCSpider:
+    # Serializes SQLite writes when several accounts are scraped in parallel
+    _db_lock = threading.Lock()
+    # webdriver-manager resolves the driver binary once per process
+    _driver_manager_path = None
+    _driver_manager_lock = threading.Lock()
 
     def __init__(self, username: str, password: str):
         if 'PYTHON_IN_DOCKER' not in os.environ: 
@@ -46,13 +85,14 @@ class SGCCSpider:
         raw_solver_type = os.getenv("CAPTCHA_SOLVER_TYPE", "onnx")
         self.solver_type = raw_solver_type.split('#')[0].strip().lower()
         
-        if self.solver_type == "vlm":
-            from vlm_solver import VLMCaptchaResolver
-            self.resolver = VLMCaptchaResolver()
-            logging.info("Using VLM Captcha Solver")
-        else:
-            self.resolver = CaptchaResolver(os.path.join(os.path.dirname(__file__), "captcha.onnx"))
-            logging.info("Using ONNX Captcha Solver")
+        self.resolver = build_resolver(self.solver_type)
+
+        self.captcha_min_confidence = float(os.getenv("CAPTCHA_MIN_CONFIDENCE", 0.8))
+        self.captcha_extra_refreshes = int(os.getenv("CAPTCHA_EXTRA_REFRESHES", 2))
+        self.slider_calibration = SliderCalibration() if os.getenv("ENABLE_SLIDER_CALIBRATION", "true").lower() == "true" else None
+        dataset_dir = os.getenv("CAPTCHA_DATASET_DIR", "").split('#')[0].strip()
+        self.captcha_dataset = CaptchaDataset(data_path(dataset_dir)) if dataset_dir else None
+        self.captcha_cache = CaptchaCache() if os.getenv("ENABLE_CAPTCHA_CACHE", "true").lower() == "true" else None
 
         self.enable_db = os.getenv("ENABLE_DATABASE_STORAGE", "false").lower() == "true"
         self.wait_time = int(os.getenv("DRIVER_IMPLICITY_WAIT_TIME", 60))
@@ -60,6 +100,28 @@ class SGCCSpider:
         self.login_timeout = int(os.getenv("LOGIN_EXPECTED_TIME", 10))
         self.retry_delay = int(os.getenv("RETRY_WAIT_TIME_OFFSET_UNIT", 10))
         self.ignored_users = [u.strip() for u in os.getenv("IGNORE_USER_ID", "").split(",") if u.strip()]
+        self.incremental = os.getenv("ENABLE_INCREMENTAL_FETCH", "true").lower() == "true"
+        self.enable_session_cache = os.getenv("ENABLE_SESSION_CACHE", "true").lower() == "true"
+        self.session_store = SessionStore(username)
+        self.extraction_mode = os.getenv("EXTRACTION_MODE", "dom").split('#')[0].strip().lower()
+        self.capture = None
+        self.waiter = PageWaiter(self.retry_delay)
+        self.timer = StageTimer()
+        self.last_timings = {}
+
+        # Lean profile: block assets we never read, load pages eagerly, smaller window
+        self.lean_browser = os.getenv("LEAN_BROWSER", "true").lower() == "true"
+        self.page_load_strategy = os.getenv("PAGE_LOAD_STRATEGY", "eager" if self.lean_browser else "normal")
+        width, height = os.getenv("BROWSER_WINDOW_SIZE", "1366,768" if self.lean_browser else "1920,1080").split(",")
+        self.window_size = (int(width), int(height))
+
+        # Optional warm browser kept alive between scheduled runs
+        self.keep_browser = os.getenv("KEEP_BROWSER_ALIVE", "false").lower() == "true"
+        self.browser_max_runs = int(os.getenv("BROWSER_MAX_RUNS", 10))
+        self.browser_max_rss = int(os.getenv("BROWSER_MAX_RSS_MB", 800))
+        self.driver = None
+        self.driver_runs = 0
+        self.navigator = None
 
     def _click_element(self, driver, by, value):
         element = driver.find_element(by, value)
@@ -125,44 +187,53 @@ class SGCCSpider:
         return tracks
 
     def simulate_slide(self, driver, distance):
+        """
+        Press, drag along the planned tracks and release as one W3C actions
+        payload, so step timing comes from the per-move durations instead of
+        WebDriver round-trip latency
+        """
         slider = driver.find_element(By.CLASS_NAME, "slide-verify-slider-mask-item")
         
         # 1. Generate tracks
         tracks = self.get_tracks_with_jitter(distance)
         logging.info(f"Generated tracks: {len(tracks)} steps, Total distance: {sum(tracks)}")
 
+        mouse = PointerInput(interaction.POINTER_MOUSE, "mouse")
+        actions = ActionBuilder(driver, mouse=mouse)
+
         # 2. Click and hold
-        ActionChains(driver).click_and_hold(slider).perform()
-        time.sleep(random.uniform(0.1, 0.3))
+        mouse.create_pointer_move(duration=0, origin=slider)
+        mouse.create_pointer_down(button=MouseButton.LEFT)
+        planned = random.uniform(0.1, 0.3)
+        mouse.create_pause(planned)
 
-        # 3. Move along tracks
+        # 3. Move along tracks, one track step per simulated 20ms interval plus a micro-pause
         for x_offset in tracks:
             if x_offset == 0:
                 continue
                 
             # Y-axis jitter
             y_offset = random.choice([-1, 0, 1])
-            
-            ActionChains(driver).move_by_offset(xoffset=x_offset, yoffset=y_offset).perform()
-            
-            # Random micro-pause
-            time.sleep(random.uniform(0.01, 0.03))
+            step_ms = 20 + random.randint(10, 30)
+            mouse.create_pointer_move(duration=step_ms, x=x_offset, y=y_offset, origin="pointer")
+            planned += step_ms / 1000
 
         # 4. Pause before release
-        time.sleep(random.uniform(0.2, 0.5))
+        pause = random.uniform(0.2, 0.5)
+        mouse.create_pause(pause)
+        planned += pause
         
         # 5. Release
-        ActionChains(driver).release().perform()
-        logging.info("Slide completed")
+        mouse.create_pointer_up(MouseButton.LEFT)
+
+        start = time.time()
+        actions.perform()
+        logging.info(f"Slide completed in {time.time() - start:.2f}s (planned {planned:.2f}s)")
 
     def init_db(self, user_id):
         try:
-            db_name = os.getenv("DB_NAME", "homeassistant.db")
-            if 'PYTHON_IN_DOCKER' in os.environ: 
-                db_name = "/data/" + db_name
-            else:
-                db_name = "./" + db_name
-            self.conn = sqlite3.connect(db_name)
+            db_name = data_path(os.getenv("DB_NAME", "homeassistant.db"))
+            self.conn = sqlite3.connect(db_name, timeout=30)
             self.conn.cursor()
             
             self.table_daily = f"daily{user_id}"
@@ -188,6 +259,25 @@ class SGCCSpider:
         except Exception as e:
             logging.debug(f"DB Insert Error: {e}")
 
+    def db_insert_usage_bulk(self, rows):
+        """
+        Insert many (date, usage) rows in a single transaction
+        """
+        if not self.conn: return
+        try:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.table_daily} VALUES(strftime('%Y-%m-%d', ?), ?);", rows)
+            self.conn.commit()
+        except Exception as e:
+            logging.debug(f"DB Insert Error: {e}")
+
+    def db_load_meta(self):
+        if not self.conn: return {}
+        try:
+            return dict(self.conn.execute(f"SELECT name, value FROM {self.table_meta}").fetchall())
+        except Exception as e:
+            logging.debug(f"DB Read Error: {e}")
+            return {}
+
     def db_insert_meta(self, data: dict):
         if not self.conn: return
         try:
@@ -199,7 +289,7 @@ class SGCCSpider:
 
     def init_driver(self):
         if platform.system() == 'Windows':
-            driver = webdriver.Edge(service=EdgeService(EdgeChromiumDriverManager().install()))
+            driver = webdriver.Edge(service=EdgeService(self._resolve_driver_path(EdgeChromiumDriverManager)))
         else:
             from selenium.webdriver.chrome.service import Service as ChromeService
             from webdriver_manager.chrome import ChromeDriverManager
@@ -211,12 +301,19 @@ class SGCCSpider:
             options.add_argument('--no-sandbox')
             options.add_argument('--disable-gpu')
             options.add_argument('--disable-dev-shm-usage')
-            options.add_argument("--window-size=1920,1080")
+            options.add_argument(f"--window-size={self.window_size[0]},{self.window_size[1]}")
+            options.page_load_strategy = self.page_load_strategy
+            if self.lean_browser:
+                options.add_argument("--disable-remote-fonts")
+                options.add_argument("--mute-audio")
             
             # Anti-detection options
             options.add_argument("--disable-blink-features=AutomationControlled")
             options.add_experimental_option("excludeSwitches", ["enable-automation"])
             options.add_experimental_option('useAutomationExtension', False)
+
+            if self.extraction_mode == "network":
+                enable_performance_logging(options)
             
             chrome_binary = os.getenv("CHROME_BINARY_PATH")
             # Fallback for Docker if env var is empty (overridden by .env)
@@ -234,8 +331,7 @@ class SGCCSpider:
             if chromedriver_path:
                 service = ChromeService(executable_path=chromedriver_path)
             else:
-                driver_path = ChromeDriverManager().install()
-                service = ChromeService(driver_path)
+                service = ChromeService(self._resolve_driver_path(ChromeDriverManager))
                 
             driver = webdriver.Chrome(options=options, service=service)
             
@@ -247,10 +343,169 @@ class SGCCSpider:
                     })
                 """
             })
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": JS_TRACK_REQUESTS})
+
+            if self.lean_browser:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URL_PATTERNS})
+                logging.info(f"Lean browser profile: blocking {len(LEAN_BLOCKED_URL_PATTERNS)} URL patterns, pageLoadStrategy={self.page_load_strategy}")
             
             driver.implicitly_wait(self.wait_time)
+
+            if self.extraction_mode == "network":
+                self.capture = NetworkCapture(driver, os.getenv("NETWORK_CAPTURE_DUMP_DIR") or None)
+                self.capture.start()
         return driver
 
+    @classmethod
+    def _resolve_driver_path(cls, manager_class):
+        with cls._driver_manager_lock:
+            if cls._driver_manager_path is None:
+                cls._driver_manager_path = manager_class().install()
+            return cls._driver_manager_path
+
+    def acquire_driver(self):
+        """
+        Return the warm browser from the previous run when it is healthy and
+        within its recycle limits, otherwise start a fresh one
+        """
+        if self.driver is not None:
+            reason = self._recycle_reason(self.driver)
+            if reason is None:
+                self.driver_runs += 1
+                logging.info(f"Reusing warm browser (run {self.driver_runs}/{self.browser_max_runs})")
+                self.navigator = PageNavigator(self, self.driver)
+                return self.driver, True
+            logging.info(f"Recycling browser: {reason}")
+            self.quit_driver()
+
+        self.driver = self.init_driver()
+        self.driver_runs = 1
+        self.navigator = PageNavigator(self, self.driver)
+        return self.driver, False
+
+    def release_driver(self):
+        if not self.keep_browser:
+            self.quit_driver()
+
+    def _browser_cpu(self, driver):
+        """
+        CPU seconds used so far by chromedriver and the browser processes
+        """
+        try:
+            return process_tree_cpu_seconds(driver.service.process.pid)
+        except Exception:
+            return None
+
+    def quit_driver(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logging.debug(f"Failed to quit driver: {e}")
+            self.driver = None
+            self.driver_runs = 0
+
+    def _recycle_reason(self, driver):
+        if self.driver_runs >= self.browser_max_runs:
+            return f"reached {self.browser_max_runs} runs"
+        try:
+            driver.execute_script("return 1;")
+        except Exception as e:
+            return f"health check failed ({e.__class__.__name__})"
+        try:
+            rss = process_tree_rss_mb(driver.service.process.pid)
+        except Exception:
+            rss = None
+        if rss is not None and rss > self.browser_max_rss:
+            return f"memory {rss:.0f} MB above {self.browser_max_rss} MB"
+        return None
+
+    def restore_session(self, driver, warm=False):
+        """
+        Reuse the session saved by a previous run, falling back to a full login
+        when it is missing or has expired on the portal side.
+        """
+        if warm and self.session_store.is_valid(driver, self.login_timeout, self.wait_time):
+            logging.info("Warm browser is still logged in, skipping login.")
+            return True
+        if not self.enable_session_cache:
+            return False
+        if not self.session_store.restore(driver):
+            return False
+        if self.session_store.is_valid(driver, self.login_timeout, self.wait_time):
+            logging.info("Stored browser session is still valid, skipping login.")
+            return True
+        logging.info("Stored browser session has expired, logging in again.")
+        self.session_store.clear()
+        return False
+
+    def _refresh_captcha(self, driver):
+        """
+        Click the captcha refresh icon
+        :return: False if no refresh button was found
+        """
+        try:
+            # Try common selectors for the refresh button
+            refresh_btns = driver.find_elements(By.CLASS_NAME, "slide-verify-refresh-icon")
+            if not refresh_btns:
+                refresh_btns = driver.find_elements(By.XPATH, "//*[@id='slideVerify']//i[contains(@class, 'refresh')]")
+
+            if refresh_btns:
+                refresh_btns[0].click()
+                logging.info("Clicked refresh button.")
+            else:
+                logging.warning("Could not find refresh button, skipping refresh.")
+                return False
+        except Exception as e:
+            logging.warning(f"Failed to refresh captcha: {e}")
+        return True
+
+    def _read_captcha(self, driver):
+        """
+        :return: (captcha image, rendered width / image width, slider piece image or None)
+        """
+        # Get image and dimensions
+        js_img = 'return document.getElementById("slideVerify").childNodes[0].toDataURL("image/png");'
+        base64_img = driver.execute_script(js_img)
+
+        # Get rendered width (CSS width) - Use getBoundingClientRect for float precision
+        js_width = 'return document.getElementById("slideVerify").childNodes[0].getBoundingClientRect().width;'
+        rendered_width = driver.execute_script(js_width)
+
+        img_data = base64_img.split(',')[1]
+        image = base64_to_image(img_data)
+
+        # The piece is drawn on its own canvas, same size as the background
+        piece = None
+        try:
+            js_piece = 'return document.getElementById("slideVerify").childNodes[1].toDataURL("image/png");'
+            piece = base64_to_image(driver.execute_script(js_piece).split(',')[1])
+        except Exception as e:
+            logging.debug(f"Failed to read the slider piece: {e}")
+
+        # Calculate scale factor: Rendered Width / Actual Image Width
+        return image, rendered_width / image.width, piece
+
+    def _locate_gap(self, image, piece=None):
+        """
+        :return: (gap x, confidence, cache key), answered from the captcha cache when the image was seen before
+        """
+        if not self.captcha_cache:
+            return (*self.resolver.locate_gap(image, piece), None)
+
+        key = dhash(image)
+        cached = self.captcha_cache.lookup(key)
+        if cached:
+            gap_x, confidence, success = cached
+            if success:
+                logging.info(f"Captcha cache hit: Gap={gap_x} solved this image before")
+                return gap_x, 1.0, key
+            if success is False:
+                logging.info(f"Captcha cache hit: Gap={gap_x} failed on this image before, skipping it")
+                return gap_x, 0.0, key
+        return (*self.resolver.locate_gap(image, piece), key)
+
     @ScreenshotOnFailure.watch
     def perform_login(self, driver):
         try:
@@ -259,12 +514,12 @@ class SGCCSpider:
         except:
             logging.debug(f"Failed to load login page: {URL_LOGIN}")
         
-        time.sleep(self.retry_delay * 2)
+        self.waiter.network_idle(driver, "login page", timeout=self.retry_delay * 2)
         self._click_element(driver, By.CLASS_NAME, "user")
         self._click_element(driver, By.XPATH, '//*[@id="login_box"]/div[1]/div[1]/div[2]/span')
-        time.sleep(self.retry_delay)
+        self.waiter.element(driver, "password login tab", By.XPATH, '//*[@id="login_box"]/div[2]/div[1]/form/div[1]/div[3]/div/span[2]')
         self._click_element(driver, By.XPATH, '//*[@id="login_box"]/div[2]/div[1]/form/div[1]/div[3]/div/span[2]')
-        time.sleep(self.retry_delay)
+        self.waiter.element(driver, "login form", By.CLASS_NAME, "el-input__inner")
 
         inputs = driver.find_elements(By.CLASS_NAME, "el-input__inner")
         logging.info("Inputting username...")
@@ -283,9 +538,9 @@ class SGCCSpider:
         except:
             logging.warning("Captcha modal did not appear! Retrying login click...")
             self._click_element(driver, By.CLASS_NAME, "el-button.el-button--primary")
-            time.sleep(5)
+            self.waiter.element(driver, "captcha modal", By.ID, "slideVerify", timeout=5)
 
-        time.sleep(self.retry_delay)
+        self.waiter.network_idle(driver, "captcha image")
 
         for attempt in range(1, self.max_retries + 1):
             logging.info(f"Attempt {attempt}: Solving captcha...")
@@ -298,74 +553,56 @@ class SGCCSpider:
                 logging.info(f"Waiting {delay:.2f}s before refresh...")
                 time.sleep(delay)
                 
-                try:
-                    # Try common selectors for the refresh button
-                    refresh_btns = driver.find_elements(By.CLASS_NAME, "slide-verify-refresh-icon")
-                    if not refresh_btns:
-                        refresh_btns = driver.find_elements(By.XPATH, "//*[@id='slideVerify']//i[contains(@class, 'refresh')]")
-                    
-                    if refresh_btns:
-                        refresh_btns[0].click()
-                        logging.info("Clicked refresh button.")
-                    else:
-                        logging.warning("Could not find refresh button, skipping refresh.")
-                        break
-                except Exception as e:
-                    logging.warning(f"Failed to refresh captcha: {e}")
+                if not self._refresh_captcha(driver):
+                    break
             
             # Wait before actual solve
             pre_solve_delay = random.uniform(7, 10)
             logging.info(f"Waiting {pre_solve_delay:.2f}s before solving...")
             time.sleep(pre_solve_delay)
             
-            # Get image and dimensions
-            js_img = 'return document.getElementById("slideVerify").childNodes[0].toDataURL("image/png");'
-            base64_img = driver.execute_script(js_img)
-            
-            # Get rendered width (CSS width)
-            # Get rendered width (CSS width) - Use getBoundingClientRect for float precision
-            js_width = 'return document.getElementById("slideVerify").childNodes[0].getBoundingClientRect().width;'
-            rendered_width = driver.execute_script(js_width)
-            
-            img_data = base64_img.split(',')[1]
-            image = base64_to_image(img_data)
-            
-            # Calculate scale factor: Rendered Width / Actual Image Width
-            scale_factor = rendered_width / image.width
-            
-            gap_pos = self.resolver.solve_gap(image)
+            image, scale_factor, piece = self._read_captcha(driver)
+
+            # Swap low-confidence captchas for fresh ones instead of spending a slide on them
+            gap_pos, confidence, cache_key = self._locate_gap(image, piece)
+            for r in range(self.captcha_extra_refreshes):
+                if confidence >= self.captcha_min_confidence:
+                    break
+                logging.info(f"Captcha confidence {confidence:.2f} below {self.captcha_min_confidence}, refreshing ({r+1}/{self.captcha_extra_refreshes})...")
+                time.sleep(random.uniform(2, 4))
+                if not self._refresh_captcha(driver):
+                    break
+                self.waiter.network_idle(driver, "captcha image")
+                image, scale_factor, piece = self._read_captcha(driver)
+                gap_pos, confidence, cache_key = self._locate_gap(image, piece)
+            logging.info(f"Captcha confidence: {confidence:.2f}")
+
+            if confidence <= 0:
+                # Nothing found at all, sliding would be a guaranteed miss
+                logging.warning(f"No gap found (Attempt {attempt}), skipping the slide")
+                continue
             
             # Apply scaling and round to nearest integer
             final_distance = int(round(gap_pos * scale_factor))
             
             # Apply manual offset
-            slider_offset = int(os.getenv("SLIDER_OFFSET", 5))
+            if self.slider_calibration:
+                slider_offset = self.slider_calibration.next_offset()
+            else:
+                slider_offset = int(os.getenv("SLIDER_OFFSET", 5))
             final_distance += slider_offset
             
             logging.info(f"Captcha: Gap={gap_pos}, Scale={scale_factor:.2f}, Offset={slider_offset}, FinalDist={final_distance}")
             
-            # Save debug image with lines
-            # try:
-            #     from PIL import ImageDraw
-            #     debug_img = image.copy()
-            #     draw = ImageDraw.Draw(debug_img)
-                
-            #     # Red line: Original VLM detection
-            #     draw.line([(gap_pos, 0), (gap_pos, debug_img.height)], fill="red", width=3)
-                
-            #     # Green line: Final target (converted back to image scale)
-            #     final_target_on_image = int(final_distance / scale_factor)
-            #     draw.line([(final_target_on_image, 0), (final_target_on_image, debug_img.height)], fill="green", width=3)
-                
-            #     timestamp = time.strftime("%Y%m%d_%H%M%S")
-            #     debug_path = f"./errors/captcha_{timestamp}.png"
-            #     debug_img.save(debug_path)
-            #     logging.info(f"Saved debug captcha image to {debug_path}")
-            # except Exception as e:
-            #     logging.warning(f"Failed to save debug image: {e}")
-
             self.simulate_slide(driver, final_distance)
-            time.sleep(self.retry_delay)
+            self.waiter.url_changed(driver, "login redirect", URL_LOGIN)
+            success = driver.current_url != URL_LOGIN
+            if self.captcha_cache:
+                self.captcha_cache.record(cache_key, gap_pos, confidence, success=success, offset=slider_offset)
+            if self.slider_calibration:
+                self.slider_calibration.record(gap_pos, scale_factor, slider_offset, success)
+            if self.captcha_dataset:
+                self.captcha_dataset.save(image, self.solver_type, gap_pos, confidence, scale_factor, slider_offset, final_distance, success)
             
             if driver.current_url == URL_LOGIN:
                 logging.info(f"Login failed (Attempt {attempt}), retrying captcha...")
@@ -380,81 +617,134 @@ class SGCCSpider:
                 #     logging.warning(f"Failed to save failure screenshot: {e}")
 
                 self._click_element(driver, By.CLASS_NAME, "el-button.el-button--primary")
-                time.sleep(self.retry_delay * 2)
+                self.waiter.element(driver, "captcha modal", By.ID, "slideVerify", timeout=self.retry_delay * 2)
             else:
                 return True
         return False
         
-    def run(self):
-        driver = self.init_driver()
+    def run(self, publisher=None):
+        self.timer.timings.clear()
+        with self.timer.stage("driver"):
+            driver, warm = self.acquire_driver()
         ScreenshotOnFailure.set_driver(driver)
+        browser_cpu = self._browser_cpu(driver)
         
         # Force window size for headless mode
-        driver.set_window_size(1920, 1080)
+        driver.set_window_size(*self.window_size)
         size = driver.get_window_size()
         pixel_ratio = driver.execute_script("return window.devicePixelRatio;")
         logging.info(f"Driver initialized. Window size: {size}, DevicePixelRatio: {pixel_ratio}")
         
         # Start Screen Recording
-        from recorder import ScreenRecorder
+        from recorder import create_recorder
         timestamp = time.strftime("%Y%m%d_%H%M%S")
-        video_path = f"./errors/record_{timestamp}.avi"
-        recorder = ScreenRecorder(driver, video_path, fps=3.0)
+        video_path = f"./errors/record_{timestamp}_{self.username[-4:]}.avi"
+        recorder = create_recorder(driver, video_path, fps=3.0)
         recorder.start()
+        ScreenshotOnFailure.set_recorder(recorder)
         
-        publisher = MQTTPublisher()
+        if publisher is None:
+            publisher = MQTTPublisher()
         
         try:
-            if self.perform_login(driver):
+            with self.timer.stage("login"):
+                logged_in = self.restore_session(driver, warm) or self.perform_login(driver)
+            if logged_in:
                 logging.info("Login successful!")
-                # Stop recording immediately after success
-                recorder.stop()
-                
-                # Delete video if successful (User request)
-                try:
-                    if os.path.exists(video_path):
-                        os.remove(video_path)
-                        logging.info(f"Login successful, deleted recording: {video_path}")
-                except Exception as e:
-                    logging.warning(f"Failed to delete recording: {e}")
+                if self.enable_session_cache:
+                    self.session_store.save(driver)
+                # In memory the recording keeps running for the whole run,
+                # on disk it is only kept for failed logins
+                if recorder.ring is None:
+                    recorder.stop()
+                    
+                    # Delete video if successful (User request)
+                    try:
+                        if os.path.exists(video_path):
+                            os.remove(video_path)
+                            logging.info(f"Login successful, deleted recording: {video_path}")
+                    except Exception as e:
+                        logging.warning(f"Failed to delete recording: {e}")
             else:
                 logging.error("Login failed!")
-                recorder.stop()
-                driver.quit()
+                self._abort_run(recorder, "login")
                 return
         except Exception as e:
             logging.error(f"Login exception: {e}")
-            recorder.stop()
-            driver.quit()
+            self._abort_run(recorder, "login")
             return
 
-        time.sleep(self.retry_delay)
-        user_ids = self.get_user_ids(driver)
+        try:
+            with self.timer.stage("user list"):
+                self.waiter.network_idle(driver, "after login")
+                user_ids = self.get_user_ids(driver)
+        except Exception:
+            self._abort_run(recorder, "user_list")
+            raise
+        if not user_ids:
+            logging.error("No users found!")
+            self._abort_run(recorder, "user_list")
+            return
         logging.info(f"Found users: {user_ids}")
 
+        self.navigator.invalidate()
+
+        users = []
         for index, user_id in enumerate(user_ids):
             if user_id in self.ignored_users:
                 logging.info(f"Skipping ignored user: {user_id}")
-                continue
+            else:
+                users.append((index, user_id))
 
+        # Visit each page once for all users: balances first, then usage data
+        balances = {}
+        for index, user_id in users:
             try:
-                driver.get(URL_BALANCE)
-                time.sleep(self.retry_delay)
-                self.select_user(driver, index)
-                time.sleep(self.retry_delay)
-                
-                data = self.collect_data(driver, user_id, index)
-                publisher.publish_user_data(user_id, *data)
-                
-                time.sleep(self.retry_delay)
+                with self.timer.stage("balance"):
+                    balances[user_id] = self.read_balance(driver, user_id, index)
+            except Exception as e:
+                logging.error(f"Failed to process user {user_id}: {e}")
+                recorder.flush(f"balance_{user_id}")
+
+        for index, user_id in users:
+            if user_id not in balances:
+                continue
+            try:
+                with self.timer.stage("collect"):
+                    data = self.collect_data(driver, user_id, index, balances[user_id])
+                with self.timer.stage("publish"):
+                    publisher.publish_user_data(user_id, *data)
             except Exception as e:
                 logging.error(f"Failed to process user {user_id}: {e}")
+                recorder.flush(f"collect_{user_id}")
                 continue
 
         logging.info("All tasks completed successfully.")
+        self.waiter.report()
+        self.navigator.report()
+        if self.captcha_cache:
+            self.captcha_cache.report()
+        self.last_timings = self.timer.report()
         self.cleanup_debug_images()
+        self._stop_recorder(recorder)
+        cpu = self._browser_cpu(driver)
+        if cpu is not None and browser_cpu is not None:
+            self.last_timings["browser cpu"] = cpu - browser_cpu
+            logging.info(f"Browser CPU time this run: {cpu - browser_cpu:.2f}s")
+        self.release_driver()
+
+    def _stop_recorder(self, recorder):
         recorder.stop()
-        driver.quit()
+        ScreenshotOnFailure.set_recorder(None)
+
+    def _abort_run(self, recorder, reason):
+        """
+        End a run that failed early: keep the recording, free the browser
+        """
+        recorder.flush(reason)
+        self._stop_recorder(recorder)
+        self.release_driver()
+        self.last_timings = self.timer.report()
 
     def cleanup_debug_images(self):
         try:
@@ -473,34 +763,78 @@ class SGCCSpider:
         return driver.find_element(By.XPATH, '//*[@id="app"]/div/div/article/div/div/div[2]/div/div/div[1]/div[2]/div/div/div/div[2]/div/div[1]/div/ul/div/li[1]/span[2]').text
     
     def select_user(self, driver, index):
-        elements = driver.find_elements(By.CLASS_NAME, "button_confirm")
-        if elements:
+        if self.waiter.element(driver, "confirm dialog", By.CLASS_NAME, "button_confirm", visible=False, timeout=1):
             self._click_element(driver, By.XPATH, f'''//*[@id="app"]/div/div[2]/div/div/div/div[2]/div[2]/div/button''')
-        time.sleep(self.retry_delay)
+            self.waiter.network_idle(driver, "confirm dialog closed")
+        self.waiter.element(driver, "account selector", By.CLASS_NAME, "el-input__suffix")
         self._click_element(driver, By.CLASS_NAME, "el-input__suffix")
-        time.sleep(self.retry_delay)
+        self.waiter.element(driver, "account list", By.XPATH, f"/html/body/div[2]/div[1]/div[1]/ul/li[{index+1}]/span")
         self._click_element(driver, By.XPATH, f"/html/body/div[2]/div[1]/div[1]/ul/li[{index+1}]/span")
 
-    def collect_data(self, driver, user_id, index):
-        balance = self.get_balance(driver)
+    def read_balance(self, driver, user_id, index):
+        self.navigator.goto(URL_BALANCE)
+        if self.capture:
+            self.capture.reset()
+        self.navigator.select_user(index)
+
+        captured = self.capture.collect() if self.capture else {}
+        balance = captured.get("balance")
+        if balance is None:
+            balance = self.get_balance(driver)
         logging.info(f"User {user_id} Balance: {balance}")
-        
-        time.sleep(self.retry_delay)
-        driver.get(URL_USAGE)
-        time.sleep(self.retry_delay)
-        self.select_user(driver, index)
-        time.sleep(self.retry_delay)
-        
-        yearly_usage, yearly_charge = self.get_yearly_usage(driver)
-        logging.info(f"User {user_id} Yearly: {yearly_usage} kWh, {yearly_charge} CNY")
+        return balance
 
-        months, month_usages, month_charges = self.get_monthly_usage(driver)
-        
-        last_daily_date, last_daily_usage = self.get_daily_usage(driver)
+    def collect_data(self, driver, user_id, index, balance):
+        self.navigator.goto(URL_USAGE)
+        if self.capture:
+            self.capture.reset()
+        self.navigator.select_user(index)
+
+        captured = {}
+        if self.capture:
+            captured = self.capture.collect()
+            logging.info(f"User {user_id} captured from network: {sorted(captured.keys())}")
+
+        if "days" in captured:
+            last_daily_date, last_daily_usage = captured["days"][0]
+        else:
+            last_daily_date, last_daily_usage = self.get_daily_usage(driver)
         logging.info(f"User {user_id} Daily: {last_daily_date} - {last_daily_usage} kWh")
 
+        watermark = self.load_watermark(user_id)
+        # A failed read (None) is never "unchanged"
+        if (last_daily_date is not None and balance is not None
+                and watermark.get("daily_date") == str(last_daily_date) and watermark.get("balance") == str(balance)):
+            logging.info(f"User {user_id} unchanged since last run ({last_daily_date}, balance {balance}), using stored data")
+            stored = {name: None if watermark.get(name) in (None, "None") else watermark[name]
+                      for name in ("yearly_charge", "yearly_usage", "month_charge", "month_usage")}
+            return balance, last_daily_date, last_daily_usage, stored["yearly_charge"], stored["yearly_usage"], stored["month_charge"], stored["month_usage"]
+
+        if self.enable_db:
+            # Still on the daily tab, read the table before switching away.
+            # The page loads its default window, other retentions need the picker.
+            if "days" in captured and int(os.getenv("DATA_RETENTION_DAYS", 7)) == NETWORK_DEFAULT_DAILY_DAYS:
+                dates, usages = (list(col) for col in zip(*captured["days"]))
+            else:
+                dates, usages = self.get_recent_daily_usage(driver)
+
+        # The page loads the current year, in January the report is for last year
+        if captured.get("year") != self.report_year():
+            captured.pop("yearly", None)
+            captured.pop("months", None)
+
+        if "yearly" in captured:
+            yearly_usage, yearly_charge = captured["yearly"]
+        else:
+            yearly_usage, yearly_charge = self.get_yearly_usage(driver)
+        logging.info(f"User {user_id} Yearly: {yearly_usage} kWh, {yearly_charge} CNY")
+
+        if "months" in captured:
+            months, month_usages, month_charges = (list(col) for col in zip(*captured["months"]))
+        else:
+            months, month_usages, month_charges = self.get_monthly_usage(driver)
+
         if self.enable_db:
-            dates, usages = self.get_recent_daily_usage(driver)
             self.save_to_db(user_id, balance, last_daily_date, last_daily_usage, dates, usages, months, month_usages, month_charges, yearly_charge, yearly_usage)
 
         current_month_charge = month_charges[-1] if month_charges else None
@@ -508,25 +842,44 @@ class SGCCSpider:
 
         return balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage, current_month_charge, current_month_usage
 
+    def load_watermark(self, user_id):
+        """
+        Values stored by the previous run for this user (daily_date, balance,
+        yearly/monthly totals). Empty when incremental fetch is off.
+        """
+        if not (self.enable_db and self.incremental):
+            return {}
+        with self._db_lock:
+            if not self.init_db(user_id):
+                return {}
+            meta = self.db_load_meta()
+            self.conn.close()
+            return meta
+
     def get_user_ids(self, driver):
         try:
             driver.refresh()
-            time.sleep(self.retry_delay * 2)
+            self.waiter.network_idle(driver, "user list page", timeout=self.retry_delay * 2)
             WebDriverWait(driver, self.wait_time).until(EC.presence_of_element_located((By.CLASS_NAME, 'el-dropdown')))
             self._click_element(driver, By.XPATH, "//div[@class='el-dropdown']/span")
-            time.sleep(self.retry_delay)
             
             target = driver.find_element(By.CLASS_NAME, "el-dropdown-menu.el-popper").find_element(By.TAG_NAME, "li")
             WebDriverWait(driver, self.wait_time).until(EC.visibility_of(target))
-            time.sleep(self.retry_delay)
+            self.waiter.rows_stable(driver, "user list", "//ul[contains(@class, 'el-dropdown-menu')]/li")
             
             elements = driver.find_element(By.CLASS_NAME, "el-dropdown-menu.el-popper").find_elements(By.TAG_NAME, "li")
             return [re.findall("[0-9]+", e.text)[-1] for e in elements]
         except Exception as e:
             logging.error(f"Failed to get user IDs: {e}")
-            driver.quit()
             return []
 
+    def read_table(self, driver, rows_xpath):
+        """
+        Extract every row of a table with a single execute_script call
+        :return: List of rows, first cell as text and the others as float (None if empty)
+        """
+        return driver.execute_script(JS_READ_TABLE, rows_xpath) or []
+
     def get_balance(self, driver):
         try:
             balance = driver.find_element(By.CLASS_NAME, "num").text
@@ -535,16 +888,15 @@ class SGCCSpider:
         except:
             return None
 
+    def report_year(self):
+        # In January the current year has no complete month yet, report last year
+        now = datetime.now()
+        return now.year - 1 if now.month == 1 else now.year
+
     def get_yearly_usage(self, driver):
         try:
-            if datetime.now().month == 1:
-                self._click_element(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
-                time.sleep(self.retry_delay)
-                driver.find_element(By.XPATH, f"//span[contains(text(), '{datetime.now().year - 1}')]").click()
-                time.sleep(self.retry_delay)
-            
-            self._click_element(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']")
-            time.sleep(self.retry_delay)
+            self.navigator.open_tab("first")
+            self.navigator.select_year(self.report_year())
             
             WebDriverWait(driver, self.wait_time).until(EC.visibility_of(driver.find_element(By.CLASS_NAME, "total")))
             
@@ -557,80 +909,146 @@ class SGCCSpider:
 
     def get_daily_usage(self, driver):
         try:
-            self._click_element(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']")
-            time.sleep(self.retry_delay)
+            self.navigator.open_tab("second")
+            self.waiter.rows_stable(driver, "daily table", XPATH_DAILY_ROWS)
             
             usage_elem = driver.find_element(By.XPATH, "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[2]/div")
             WebDriverWait(driver, self.wait_time).until(EC.visibility_of(usage_elem))
             
-            date_elem = driver.find_element(By.XPATH, "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[1]/div")
-            return date_elem.text, float(usage_elem.text)
+            rows = [row for row in self.read_table(driver, XPATH_DAILY_ROWS) if row[1] is not None]
+            return rows[0][0], rows[0][1]
         except Exception as e:
             logging.error(f"Failed to get daily usage: {e}")
             return None, None
 
     def get_monthly_usage(self, driver):
         try:
-            self._click_element(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']")
-            time.sleep(self.retry_delay)
-            
-            if datetime.now().month == 1:
-                self._click_element(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
-                time.sleep(self.retry_delay)
-                driver.find_element(By.XPATH, f"//span[contains(text(), '{datetime.now().year - 1}')]").click()
-                time.sleep(self.retry_delay)
+            self.navigator.open_tab("first")
+            self.navigator.select_year(self.report_year())
 
             WebDriverWait(driver, self.wait_time).until(EC.visibility_of(driver.find_element(By.CLASS_NAME, "total")))
+            self.waiter.rows_stable(driver, "monthly table", XPATH_MONTHLY_ROWS)
             
-            text = driver.find_element(By.XPATH, "//*[@id='pane-first']/div[1]/div[2]/div[2]/div/div[3]/table/tbody").text
-            items = text.split("\n")
-            if "MAX" in items: items.remove("MAX")
-            
-            data = np.array(items).reshape(-1, 3)
-            return [row[0] for row in data], [row[1] for row in data], [row[2] for row in data]
+            rows = [row for row in self.read_table(driver, XPATH_MONTHLY_ROWS) if len(row) >= 3]
+            return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
         except Exception as e:
             logging.error(f"Failed to get monthly data: {e}")
             return None, None, None
 
     def get_recent_daily_usage(self, driver):
         retention = int(os.getenv("DATA_RETENTION_DAYS", 7))
-        self._click_element(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']")
-        time.sleep(self.retry_delay)
+        self.navigator.open_tab("second")
 
         if retention == 7:
             self._click_element(driver, By.XPATH, "//*[@id='pane-second']/div[1]/div/label[1]/span[1]")
         elif retention == 30:
             self._click_element(driver, By.XPATH, "//*[@id='pane-second']/div[1]/div/label[2]/span[1]")
+        else:
+            end = datetime.now().date()
+            self.select_date_range(driver, end - timedelta(days=retention - 1), end)
         
-        time.sleep(self.retry_delay)
+        self.waiter.network_idle(driver, "daily range switch")
         
         WebDriverWait(driver, self.wait_time).until(EC.visibility_of(driver.find_element(By.XPATH, "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[2]/div")))
+        self.waiter.rows_stable(driver, "recent daily table", XPATH_DAILY_ROWS)
         
-        rows = driver.find_elements(By.XPATH, "//*[@id='pane-second']/div[2]/div[2]/div[1]/div[3]/table/tbody/tr")
-        dates = []
-        usages = []
-        
-        for row in rows:
-            date = row.find_element(By.XPATH, "td[1]/div").text
-            usage = row.find_element(By.XPATH, "td[2]/div").text
-            if usage:
-                dates.append(date)
-                usages.append(usage)
-        return dates, usages
+        rows = [row for row in self.read_table(driver, XPATH_DAILY_ROWS) if len(row) >= 2 and row[1] is not None]
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def select_date_range(self, driver, start, end):
+        """
+        Type a custom window into the date-range picker of the daily tab
+        """
+        inputs = driver.find_elements(By.XPATH, XPATH_DAILY_RANGE_INPUTS)
+        if len(inputs) < 2:
+            raise RuntimeError("Date range picker not found on the daily tab")
+        for element, value in ((inputs[0], start), (inputs[1], end)):
+            element.click()
+            element.send_keys(Keys.CONTROL, "a")
+            element.send_keys(value.strftime("%Y-%m-%d"))
+        inputs[1].send_keys(Keys.ENTER)
+
+    def read_daily_range(self, driver, start, end):
+        self.select_date_range(driver, start, end)
+        self.waiter.network_idle(driver, "daily range switch")
+        loaded = self.waiter.rows_stable(driver, "daily range table", XPATH_DAILY_ROWS)
+        rows = self.read_table(driver, XPATH_DAILY_ROWS)
+        # The previous window's rows stay in the table until the new range
+        # loads, only rows dated inside this window prove that it did
+        rows = [(row[0], row[1]) for row in rows
+                if len(row) >= 2 and row[1] is not None and start.isoformat() <= str(row[0])[:10] <= end.isoformat()]
+        if not rows:
+            raise RuntimeError(f"Daily table did not load for {start} ~ {end}" + ("" if loaded else " (timed out)"))
+        return rows
+
+    def backfill_daily_usage(self, driver, user_id, index, since):
+        """
+        Walk the daily date-range picker month by month from `since` to today,
+        bulk-inserting each window and checkpointing progress in the meta table
+        (backfill_cursor) so an interrupted backfill resumes where it stopped.
+        Raises when a window's table does not load, the cursor stays before it.
+        """
+        with self._db_lock:
+            if not self.init_db(user_id):
+                return 0
+            cursor = self.db_load_meta().get("backfill_cursor")
+            self.conn.close()
+
+        start = since
+        if cursor:
+            start = max(since, datetime.strptime(cursor, "%Y-%m-%d").date() + timedelta(days=1))
+        today = datetime.now().date()
+        if start > today:
+            logging.info(f"User {user_id} backfill already complete up to {cursor}")
+            return 0
+
+        self.navigator.goto(URL_USAGE)
+        self.navigator.select_user(index)
+        self.navigator.open_tab("second")
+
+        total = 0
+        while start <= today:
+            next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+            end = min(next_month - timedelta(days=1), today)
+            try:
+                rows = self.read_daily_range(driver, start, end)
+            except RuntimeError:
+                if end < today:
+                    raise
+                # The current window may hold no data yet (the portal lags a day), it is never checkpointed
+                rows = []
+            with self._db_lock:
+                if self.init_db(user_id):
+                    self.db_insert_usage_bulk(rows)
+                    # A window ending today is incomplete, resume from it next time
+                    if end < today:
+                        self.db_insert_meta({'name': 'backfill_cursor', 'value': end.isoformat()})
+                    self.conn.close()
+            total += len(rows)
+            logging.info(f"User {user_id} backfilled {start} ~ {end}: {len(rows)} days")
+            start = end + timedelta(days=1)
+        return total
 
     def save_to_db(self, user_id, balance, last_daily_date, last_daily_usage, dates, usages, months, month_usages, month_charges, yearly_charge, yearly_usage):
+        with self.timer.stage("db"), self._db_lock:
+            self._save_to_db(user_id, balance, last_daily_date, last_daily_usage, dates, usages, months, month_usages, month_charges, yearly_charge, yearly_usage)
+
+    def _save_to_db(self, user_id, balance, last_daily_date, last_daily_usage, dates, usages, months, month_usages, month_charges, yearly_charge, yearly_usage):
         if self.init_db(user_id):
             self.db_insert_meta({'name': 'user', 'value': str(user_id)})
-            self.db_insert_meta({'name': 'balance', 'value': str(balance)})
-            self.db_insert_meta({'name': 'daily_date', 'value': str(last_daily_date)})
+            # balance and daily_date are the watermark, a failed read must not become one
+            if balance is not None:
+                self.db_insert_meta({'name': 'balance', 'value': str(balance)})
+            if last_daily_date is not None:
+                self.db_insert_meta({'name': 'daily_date', 'value': str(last_daily_date)})
             self.db_insert_meta({'name': 'daily_usage', 'value': str(last_daily_usage)})
             self.db_insert_meta({'name': 'yearly_usage', 'value': str(yearly_usage)})
             self.db_insert_meta({'name': 'yearly_charge', 'value': str(yearly_charge)})
             
-            for i in range(len(dates)):
-                self.db_insert_usage({'date': dates[i], 'usage': float(usages[i])})
+            # The whole window (7 or 30 days) is re-written, the portal revises recent days
+            self.db_insert_usage_bulk([(dates[i], float(usages[i])) for i in range(len(dates))])
                 
-            for i in range(len(months)):
+            for i in range(len(months or [])):
                 self.db_insert_meta({'name': f"{months[i]}usage", 'value': str(month_usages[i])})
                 self.db_insert_meta({'name': f"{months[i]}charge", 'value': str(month_charges[i])})
                 
@@ -0,0 +1,88 @@
+import logging
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+from utils import data_path
+
+# Distance between neighbouring offsets tried after failures
+EXPLORATION_STEP = 2
+# Prior odds that SLIDER_OFFSET (or the learned estimate) is right
+PRIOR_ODDS = 3
+
+
+class SliderCalibration:
+    """
+    Learns SLIDER_OFFSET from login history. Every slide is recorded as
+    (gap, scale, offset, success); the estimate is the median offset of the
+    recent successful slides, falling back to SLIDER_OFFSET until enough
+    successes exist. Failures are mostly the gap or the drag, so the estimate
+    is kept until a failure streak at it makes it more likely wrong than
+    right given its past success rate; only then do the next tries move
+    around it (+2, -2, +4, -4, ...), so a badly wrong SLIDER_OFFSET is still
+    found.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.path = data_path(os.getenv("SLIDER_CALIBRATION_DB", "slider_calibration.db"))
+        self.default_offset = int(os.getenv("SLIDER_OFFSET", 5))
+        self.min_successes = int(os.getenv("SLIDER_CALIBRATION_MIN_SUCCESSES", 1))
+        self.window = int(os.getenv("SLIDER_CALIBRATION_WINDOW", 50))
+        self.min_offset, self.max_offset = -2, 20
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS slides (time REAL, gap_x REAL, scale REAL, offset INTEGER, success INTEGER)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _recent(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT offset, success FROM slides ORDER BY time DESC LIMIT ?", (self.window,)).fetchall()
+
+    def estimate(self, rows=None):
+        successes = [offset for offset, success in (rows if rows is not None else self._recent()) if success]
+        if len(successes) < self.min_successes:
+            return self.default_offset
+        return int(round(statistics.median(successes)))
+
+    def doubt(self, rows, estimate):
+        """
+        Probability that the estimate is wrong, given the failures in a row
+        at it (within +-1) since the last success. Failures of the
+        gap or the drag are expected at the estimate's past success rate, so
+        a well established estimate needs a long unlikely streak to be doubted.
+
+        :return: (probability, tries away from the estimate during the streak)
+        """
+        streak = next((i for i, (_, success) in enumerate(rows) if success), len(rows))
+        failures = sum(1 for offset, _ in rows[:streak] if abs(offset - estimate) <= 1)
+        before = [success for offset, success in rows[streak:] if abs(offset - estimate) <= 1]
+        rate = (sum(before) + 1) / (len(before) + 2)
+        # Odds right:wrong, growing with the successes seen at the estimate
+        odds = (sum(before) + PRIOR_ODDS) * (1 - rate) ** failures
+        return 1 / (1 + odds), streak - failures
+
+    def next_offset(self):
+        rows = self._recent()
+        estimate = max(self.min_offset, min(self.max_offset, self.estimate(rows)))
+        probability, explored = self.doubt(rows, estimate)
+        if probability <= 0.5:
+            return estimate
+
+        # Look elsewhere: +2, -2, +4, -4, ... inside the allowed range (offsets
+        # past an edge are left out, not clamped), wrapping around once exhausted
+        candidates = []
+        for distance in range(EXPLORATION_STEP, self.max_offset - self.min_offset + 1, EXPLORATION_STEP):
+            candidates += [o for o in (estimate + distance, estimate - distance) if self.min_offset <= o <= self.max_offset]
+        return candidates[explored % len(candidates)]
+
+    def record(self, gap_x, scale, offset, success):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT INTO slides VALUES (?, ?, ?, ?, ?)", (time.time(), float(gap_x), float(scale), int(offset), int(success)))
+            # Keep the table small, only the recent window is ever read
+            conn.execute("DELETE FROM slides WHERE rowid NOT IN (SELECT rowid FROM slides ORDER BY time DESC LIMIT ?)", (self.window * 4,))
+        logging.info(f"Slider calibration: offset {offset} {'succeeded' if success else 'failed'}, estimate now {self.estimate()}")
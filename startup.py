@@ -1,26 +1,56 @@
 import logging
 import os
+import re
 import sys
 import time
+import threading
 import schedule
 import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from settings import *
 from sgcc_client import SGCCSpider
+from mqtt_publisher import MQTTPublisher
 from utils import ScreenshotOnFailure
 
 def setup_logging(level: str):
     logger = logging.getLogger()
     logger.setLevel(level)
     logging.getLogger("urllib3").setLevel(logging.CRITICAL)
-    format = logging.Formatter("%(asctime)s  [%(levelname)-8s] ---- %(message)s", "%Y-%m-%d %H:%M:%S")
+    format = logging.Formatter("%(asctime)s  [%(levelname)-8s] [%(threadName)s] ---- %(message)s", "%Y-%m-%d %H:%M:%S")
     sh = logging.StreamHandler(stream=sys.stdout)
     sh.setFormatter(format)
     logger.addHandler(sh)
 
-def execute_job(spider: SGCCSpider, max_retries: int):
+def load_accounts():
+    """
+    Read PHONE_NUMBER/PASSWORD plus any numbered pairs (PHONE_NUMBER_2/PASSWORD_2, ...)
+    """
+    accounts = []
+    for key in os.environ:
+        match = re.fullmatch(r"PHONE_NUMBER(_\d+)?", key)
+        if not match:
+            continue
+        suffix = match.group(1) or ""
+        phone_number = os.getenv(key, "").strip()
+        password = os.getenv(f"PASSWORD{suffix}", "")
+        if phone_number and password:
+            accounts.append((int(suffix[1:]) if suffix else 1, phone_number, password))
+    return [(phone_number, password) for _, phone_number, password in sorted(accounts)]
+
+def run_account(spider: SGCCSpider, publisher: MQTTPublisher):
+    threading.current_thread().name = f"acct-{spider.username[-4:]}"
+    try:
+        spider.run(publisher)
+    except Exception as e:
+        logging.error(f"Account {spider.username[-4:]} failed: {e}")
+
+def execute_job(spiders: list, publisher: MQTTPublisher, max_workers: int):
     try:
-        spider.run()
+        # Each worker owns its own browser; a failing account does not affect the others
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(spiders)))) as pool:
+            for spider in spiders:
+                pool.submit(run_account, spider, publisher)
         
         # Calculate the real next run time (filter out past/current jobs)
         now = datetime.now()
@@ -39,23 +69,23 @@ def main():
         import dotenv
         dotenv.load_dotenv(verbose=True)
         
-    phone_number = os.getenv("PHONE_NUMBER")
-    password = os.getenv("PASSWORD")
+    accounts = load_accounts()
     job_start_time = os.getenv("JOB_START_TIME", "07:00")
     log_level = os.getenv("LOG_LEVEL", "INFO")
-    max_retries = int(os.getenv("RETRY_TIMES_LIMIT", 5))
+    max_workers = int(os.getenv("MAX_CONCURRENT_ACCOUNTS", 2))
     
     setup_logging(log_level)
     
-    if not phone_number or not password:
+    if not accounts:
         logging.error("Missing credentials (PHONE_NUMBER or PASSWORD).")
         sys.exit(1)
 
-    logging.info("Starting SGCC Electricity Spider...")
+    logging.info(f"Starting SGCC Electricity Spider for {len(accounts)} account(s)...")
     
     ScreenshotOnFailure.init(root_dir='./errors')
     
-    spider = SGCCSpider(phone_number, password)
+    spiders = [SGCCSpider(phone_number, password) for phone_number, password in accounts]
+    publisher = MQTTPublisher()
 
     # Random delay logic
     random_delay = random.randint(-10, 10)
@@ -64,11 +94,11 @@ def main():
     
     logging.info(f"Scheduled runs at {parsed_time.strftime('%H:%M')} and {next_run_time.strftime('%H:%M')}")
     
-    schedule.every().day.at(parsed_time.strftime("%H:%M")).do(execute_job, spider, max_retries)
-    schedule.every().day.at(next_run_time.strftime("%H:%M")).do(execute_job, spider, max_retries)
+    schedule.every().day.at(parsed_time.strftime("%H:%M")).do(execute_job, spiders, publisher, max_workers)
+    schedule.every().day.at(next_run_time.strftime("%H:%M")).do(execute_job, spiders, publisher, max_workers)
     
     # Run immediately on startup
-    execute_job(spider, max_retries)
+    execute_job(spiders, publisher, max_workers)
 
     while True:
         schedule.run_pending()
@@ -0,0 +1,60 @@
+"""
+Offline check of the EXTRACTION_MODE=network parser against recorded responses:
+
+    python3 -m unittest discover tests
+
+fixtures/network_capture is a NETWORK_CAPTURE_DUMP_DIR dump of two accounts
+recorded from tools/fake_portal, followed by unrelated responses (notices,
+user info) that carry generic date/usage/balance keys.
+"""
+
+import os
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from network_capture import load_dump, parse_responses
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "network_capture")
+
+
+class ParseResponsesTest(unittest.TestCase):
+    def setUp(self):
+        self.parsed = parse_responses(load_dump(FIXTURE))
+
+    def test_last_selected_account_wins(self):
+        self.assertEqual(self.parsed["balance"], 280.29)
+        self.assertEqual(self.parsed["yearly"], (3647.14, 2036.2))
+
+    def test_months_oldest_first(self):
+        months = self.parsed["months"]
+        self.assertEqual(len(months), 12)
+        self.assertEqual(months[0], ("2025-01", 301.4, 168.27))
+        self.assertEqual(months[-1], ("2025-12", 317.82, 177.44))
+        self.assertEqual(self.parsed["year"], 2025)
+
+    def test_days_newest_first(self):
+        days = self.parsed["days"]
+        self.assertEqual(len(days), 7)
+        self.assertEqual(days[0], ("2026-10-14", 9.35))
+        self.assertEqual(days[-1], ("2026-10-08", 14.65))
+
+    def test_unrelated_endpoints_ignored(self):
+        responses = load_dump(FIXTURE)
+        decoys = [(url, body) for url, body in responses if "/api/notices" in url or "/api/userInfo" in url]
+        self.assertEqual(len(decoys), 2)
+        self.assertEqual(parse_responses(decoys), {})
+
+    def test_compact_dates_normalized(self):
+        parsed = parse_responses([
+            ("https://95598.cn/api/daily", {"dayList": [{"day": "20261014", "dayElePq": "1,234.5"}]}),
+            ("https://95598.cn/api/yearly", {"monthList": [{"month": "202510", "monthEleNum": 1, "monthEleCost": 2}]}),
+        ])
+        self.assertEqual(parsed["days"], [("2026-10-14", 1234.5)])
+        self.assertEqual(parsed["months"], [("2025-10", 1.0, 2.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Compare ONNX Runtime session settings for the captcha model.
+
+Each configuration runs in its own process (so start-up cost is not hidden
+by a warm interpreter) twice: once without the optimized-model cache and
+once loading the cache written by the first run. Reports session start-up
+time and per-inference latency:
+
+    python3 tools/bench_onnx.py
+    python3 tools/bench_onnx.py --threads 1,2,4 --opt-levels basic,all --modes sequential --image errors/captcha.png
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def worker(args):
+    """
+    Runs inside the child process, configured through ORT_* environment variables
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    from captcha_solver import CaptchaResolver
+    resolver = CaptchaResolver(args.model)
+    startup = time.perf_counter() - start
+
+    if args.image:
+        image = Image.open(args.image)
+    else:
+        import numpy as np
+        image = Image.fromarray(np.random.default_rng(0).integers(0, 255, (160, 320, 3), dtype=np.uint8))
+
+    # First call pays for lazy allocations, keep it out of the numbers
+    resolver.solve_gap(image)
+    latencies = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        resolver.solve_gap(image)
+        latencies.append(time.perf_counter() - start)
+
+    print(json.dumps({"startup": startup, "latencies": latencies}))
+
+
+def run_config(args, model, threads, opt_level, mode, use_cache):
+    env = dict(os.environ,
+               ORT_INTRA_OP_THREADS=str(threads),
+               ORT_INTER_OP_THREADS="1" if mode == "sequential" else str(threads),
+               ORT_GRAPH_OPT_LEVEL=opt_level,
+               ORT_EXECUTION_MODE=mode,
+               ORT_OPTIMIZED_MODEL_CACHE="true" if use_cache else "false")
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--model", model, "--iterations", str(args.iterations)]
+    if args.image:
+        command += ["--image", args.image]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ONNX Runtime session settings for the captcha model")
+    parser.add_argument("--model", default=os.path.join(REPO_ROOT, "captcha.onnx"))
+    parser.add_argument("--image", help="Captcha image to run on (default: random noise of captcha size)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--threads", default="1,2", help="Comma separated intra-op thread counts")
+    parser.add_argument("--opt-levels", default="disable,basic,all", help="Comma separated graph optimization levels")
+    parser.add_argument("--modes", default="sequential,parallel", help="Comma separated execution modes")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    # Work on a copy so the optimized-model cache lands in a scratch directory
+    workdir = tempfile.mkdtemp(prefix="sgcc-onnx-")
+    model = os.path.join(workdir, os.path.basename(args.model))
+    with open(args.model, "rb") as src, open(model, "wb") as dst:
+        dst.write(src.read())
+
+    print(f"{'threads':>8}{'opt level':>11}{'mode':>12}{'cold (s)':>10}{'cached (s)':>12}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for threads, opt_level, mode in itertools.product(args.threads.split(","), args.opt_levels.split(","), args.modes.split(",")):
+        for name in os.listdir(workdir):
+            if ".opt-" in name:
+                os.remove(os.path.join(workdir, name))
+        cold = run_config(args, model, int(threads), opt_level, mode, use_cache=False)
+        # First cached run writes the optimized model, the second one loads it
+        run_config(args, model, int(threads), opt_level, mode, use_cache=True)
+        cached = run_config(args, model, int(threads), opt_level, mode, use_cache=True)
+
+        latencies = [v * 1000 for v in cold["latencies"] + cached["latencies"]]
+        print(f"{threads:>8}{opt_level:>11}{mode:>12}{cold['startup']:>10.3f}{cached['startup']:>12.3f}"
+              f"{statistics.median(latencies):>10.2f}{percentile(latencies, 95):>10.2f}")
+
+    for name in os.listdir(workdir):
+        os.remove(os.path.join(workdir, name))
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+End-to-end benchmark of SGCCSpider.run() against the local fake portal.
+
+Starts tools/fake_portal in-process, runs the full pipeline headless in a
+scratch working directory and reports the wall time of each phase (driver,
+login, user list, balance, collect, db, publish) per run:
+
+    python3 tools/benchmark.py --runs 3 --profile realistic
+    python3 tools/benchmark.py --env LEAN_BROWSER=false --env EXTRACTION_MODE=network
+    python3 tools/benchmark.py --env RECORDER_BACKEND=screenshot
+
+Besides wall time per phase it reports the CPU time of this process and of
+the chromedriver/browser process tree.
+
+MQTT publishing goes to MQTT_BROKER as usual; without a broker the publish
+phase only measures the client-side cost.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tools.fake_portal.server import LATENCY_PROFILES, FakePortal
+
+PHASES = ["driver", "login", "user list", "balance", "collect", "db", "publish"]
+
+
+def print_report(results):
+    header = f"{'phase':<12}" + "".join(f"{'run ' + str(i + 1):>10}" for i in range(len(results))) + f"{'mean':>10}{'min':>10}{'max':>10}"
+    print(header)
+    print("-" * len(header))
+    for phase in PHASES + ["wall", "python cpu", "browser cpu"]:
+        values = [r.get(phase, 0.0) for r in results]
+        row = f"{phase:<12}" + "".join(f"{v:>10.2f}" for v in values)
+        row += f"{statistics.mean(values):>10.2f}{min(values):>10.2f}{max(values):>10.2f}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraping pipeline against the fake 95598 portal")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="lan", help="Fake portal latency profile")
+    parser.add_argument("--accounts", type=int, default=2, help="Number of user IDs on the fake account")
+    parser.add_argument("--captcha-tolerance", type=float, help="Make the fake captcha check the slide distance (px)")
+    parser.add_argument("--fresh-db", action="store_true", help="Start every run with an empty database (no incremental skips)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra environment for the spider")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the scratch directory (database, errors/)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s  [%(levelname)-8s] ---- %(message)s")
+
+    portal = FakePortal(port=0, profile=args.profile, accounts=args.accounts, captcha_tolerance=args.captcha_tolerance).start()
+    workdir = tempfile.mkdtemp(prefix="sgcc-bench-")
+
+    # Must be in place before settings.py is imported
+    os.environ.update({
+        "SGCC_BASE_URL": portal.url,
+        "ENABLE_DATABASE_STORAGE": "true",
+        "DB_NAME": "benchmark.db",
+        "ENABLE_SESSION_CACHE": "false",
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+    os.environ.pop("PYTHON_IN_DOCKER", None)
+    os.chdir(workdir)
+
+    from mqtt_publisher import MQTTPublisher
+    from sgcc_client import SGCCSpider
+    from utils import ScreenshotOnFailure
+
+    ScreenshotOnFailure.init(root_dir="./errors")
+    spider = SGCCSpider("13800000000", "benchmark")
+    publisher = MQTTPublisher()
+
+    results = []
+    try:
+        for run in range(args.runs):
+            if args.fresh_db and os.path.exists("benchmark.db"):
+                os.remove("benchmark.db")
+            logging.info(f"Benchmark run {run + 1}/{args.runs}")
+            start = time.time()
+            cpu_start = sum(os.times()[:2])
+            spider.run(publisher)
+            results.append(dict(spider.last_timings, wall=time.time() - start, **{"python cpu": sum(os.times()[:2]) - cpu_start}))
+    finally:
+        spider.quit_driver()
+        portal.stop()
+        os.chdir(REPO_ROOT)
+        if args.keep_workdir:
+            print(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(f"Fake portal profile: {args.profile}, accounts: {args.accounts}, runs: {args.runs}")
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
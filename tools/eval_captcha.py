@@ -0,0 +1,104 @@
+"""
+Replay a labeled captcha dataset through one or more solvers, offline.
+
+The dataset directory holds captcha images plus a manifest.jsonl with one
+entry per image, gap_x being the gap's left edge in image pixels (entries
+without gap_x are skipped):
+
+    {"image": "0001.png", "gap_x": 152.0}
+
+CAPTCHA_DATASET_DIR makes the spider collect such a dataset during real
+logins. Solvers are CAPTCHA_SOLVER_TYPE values, onnx optionally with a
+model variant; each runs in its own process so peak RSS is per solver:
+
+    python3 tools/eval_captcha.py captcha_dataset --solvers onnx:fp32,onnx:int8
+    python3 tools/eval_captcha.py captcha_dataset --solvers classical,cascade
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def load_manifest(dataset):
+    entries = []
+    with open(os.path.join(dataset, "manifest.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get("gap_x") is not None:
+                    entries.append(entry)
+    return entries
+
+
+def worker(args):
+    """
+    Runs inside the child process: solve every labeled image with one solver
+    """
+    from PIL import Image
+    from cascade_solver import build_resolver
+
+    solver_type, _, variant = args.solver.partition(":")
+    if variant:
+        os.environ["CAPTCHA_MODEL_VARIANT"] = variant
+    resolver = build_resolver(solver_type)
+    results = []
+    for entry in load_manifest(args.dataset):
+        image = Image.open(os.path.join(args.dataset, entry["image"]))
+        image.load()
+        start = time.perf_counter()
+        gap_x, confidence = resolver.locate_gap(image)
+        results.append({"error": abs(gap_x - entry["gap_x"]), "found": confidence > 0, "latency": time.perf_counter() - start})
+
+    # ru_maxrss is in KB on Linux
+    print(json.dumps({"results": results, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate captcha solvers on a labeled dataset")
+    parser.add_argument("dataset", help="Directory with captcha images and manifest.jsonl")
+    parser.add_argument("--solvers", default="onnx:fp32,onnx:int8", help="Comma separated solvers, e.g. onnx:int8,classical,vlm,cascade")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="Gap error (px) still counted as a hit")
+    parser.add_argument("--solver", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solver:
+        worker(args)
+        return
+
+    print(f"{'solver':<12}{'images':>8}{'found':>8}{'hit':>8}{'err p50':>9}{'err p95':>9}{'lat p50':>9}{'lat p95':>9}{'lat p99':>9}{'img/s':>8}{'rss MB':>8}")
+    for solver in args.solvers.split(","):
+        command = [sys.executable, os.path.abspath(__file__), args.dataset, "--solver", solver]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        results = report["results"]
+        if not results:
+            print(f"{solver:<12}{0:>8}")
+            continue
+
+        errors = [r["error"] for r in results]
+        latencies = [r["latency"] * 1000 for r in results]
+        found = sum(r["found"] for r in results) / len(results)
+        hits = sum(e <= args.tolerance for e in errors) / len(results)
+        throughput = len(results) / (sum(latencies) / 1000 or 1)
+        print(f"{solver:<12}{len(results):>8}{found:>8.0%}{hits:>8.0%}{statistics.median(errors):>9.1f}{percentile(errors, 95):>9.1f}"
+              f"{statistics.median(latencies):>9.2f}{percentile(latencies, 95):>9.2f}{percentile(latencies, 99):>9.2f}"
+              f"{throughput:>8.0f}{report['peak_rss_mb']:>8.0f}")
+    print(f"hit = gap within {args.tolerance:g}px, err in px, lat in ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Local MQTT 3.1.1 broker stand-in for testing MQTTPublisher delivery.
+
+Handles CONNECT, SUBSCRIBE, PUBLISH (QoS 0/1, retained) and PINGREQ for any
+number of clients; acknowledgements can be delayed or dropped, and the
+broker can be stopped and restarted to simulate an outage:
+
+    python3 tools/fake_broker.py --port 1884 --ack-delay 0.2 --drop-fraction 0.1
+    MQTT_BROKER=127.0.0.1 MQTT_PORT=1884 python3 tools/benchmark.py
+
+Run as a script it prints every publish it receives. --outage stops
+accepting connections for that many seconds after the first publish, the
+publisher's outbox should deliver the queued data once it is back.
+"""
+
+import argparse
+import logging
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+CONNECT, CONNACK, PUBLISH, PUBACK, SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 1, 2, 3, 4, 8, 9, 12, 13, 14
+
+
+def encode_packet(packet_type, flags, body):
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes([packet_type << 4 | flags]) + bytes(encoded) + body
+
+
+def encode_string(value):
+    data = value.encode("utf-8")
+    return struct.pack(">H", len(data)) + data
+
+
+def topic_matches(pattern, topic):
+    pattern_parts, topic_parts = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class FakeBroker:
+    def __init__(self, host="127.0.0.1", port=1884, ack_delay=0.0, drop_fraction=0.0):
+        self.host = host
+        self.port = port
+        self.ack_delay = ack_delay
+        self.drop_fraction = drop_fraction
+        # (topic, payload, qos, retain) of every publish received
+        self.published = []
+        self.retained = {}
+        self.sessions = []
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        self.server = socketserver.ThreadingTCPServer((self.host, self.port), self._handler_class(), bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info(f"Fake MQTT broker listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        """
+        Stop listening and drop every client, like a broker restart. Retained messages are kept.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            try:
+                session.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        logging.info("Fake MQTT broker stopped")
+
+    def send(self, topic, payload, retain=False):
+        """
+        Publish to the subscribed clients, e.g. Home Assistant's birth message
+        """
+        if retain:
+            self.retained[topic] = payload
+        with self.lock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            if any(topic_matches(pattern, topic) for pattern in session.subscriptions):
+                session.deliver(topic, payload, retain=False)
+
+    def _handler_class(self):
+        broker = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def setup(self):
+                self.subscriptions = []
+                self.write_lock = threading.Lock()
+                with broker.lock:
+                    broker.sessions.append(self)
+
+            def finish(self):
+                with broker.lock:
+                    if self in broker.sessions:
+                        broker.sessions.remove(self)
+
+            def _read(self, size):
+                data = b""
+                while len(data) < size:
+                    chunk = self.request.recv(size - len(data))
+                    if not chunk:
+                        raise ConnectionError("client closed the connection")
+                    data += chunk
+                return data
+
+            def _write(self, data):
+                with self.write_lock:
+                    self.request.sendall(data)
+
+            def deliver(self, topic, payload, retain):
+                try:
+                    self._write(encode_packet(PUBLISH, int(retain), encode_string(topic) + payload))
+                except OSError:
+                    pass
+
+            def handle(self):
+                try:
+                    while True:
+                        header = self._read(1)[0]
+                        length, multiplier = 0, 1
+                        while True:
+                            byte = self._read(1)[0]
+                            length += (byte & 0x7F) * multiplier
+                            multiplier *= 128
+                            if not byte & 0x80:
+                                break
+                        body = self._read(length)
+                        if not self._dispatch(header >> 4, header & 0x0F, body):
+                            return
+                except (ConnectionError, OSError):
+                    return
+
+            def _dispatch(self, packet_type, flags, body):
+                if packet_type == CONNECT:
+                    self._write(encode_packet(CONNACK, 0, b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    qos, retain = (flags >> 1) & 3, bool(flags & 1)
+                    topic_length = struct.unpack(">H", body[:2])[0]
+                    topic = body[2:2 + topic_length].decode("utf-8")
+                    position = 2 + topic_length
+                    packet_id = None
+                    if qos:
+                        packet_id = body[position:position + 2]
+                        position += 2
+                    payload = body[position:]
+                    broker.published.append((topic, payload, qos, retain))
+                    if retain:
+                        broker.retained[topic] = payload
+                    logging.info(f"PUBLISH qos={qos} retain={int(retain)} {topic} {payload[:80]!r}")
+                    if qos and random.random() >= broker.drop_fraction:
+                        if broker.ack_delay:
+                            time.sleep(broker.ack_delay)
+                        self._write(encode_packet(PUBACK, 0, packet_id))
+                elif packet_type == SUBSCRIBE:
+                    packet_id, position, granted = body[:2], 2, b""
+                    while position < len(body):
+                        topic_length = struct.unpack(">H", body[position:position + 2])[0]
+                        self.subscriptions.append(body[position + 2:position + 2 + topic_length].decode("utf-8"))
+                        position += 3 + topic_length
+                        granted += b"\x00"
+                    self._write(encode_packet(SUBACK, 0, packet_id + granted))
+                    for topic, payload in list(broker.retained.items()):
+                        if any(topic_matches(pattern, topic) for pattern in self.subscriptions):
+                            self.deliver(topic, payload, retain=True)
+                elif packet_type == PINGREQ:
+                    self._write(encode_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    return False
+                return True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local MQTT broker stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1884)
+    parser.add_argument("--ack-delay", type=float, default=0.0, help="Delay before each PUBACK (s)")
+    parser.add_argument("--drop-fraction", type=float, default=0.0, help="Share of QoS 1 publishes never acknowledged")
+    parser.add_argument("--outage", type=float, default=0.0, help="Go down for this long after the first publish (s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  [%(levelname)-8s] ---- %(message)s")
+    broker = FakeBroker(args.host, args.port, args.ack_delay, args.drop_fraction).start()
+    try:
+        if args.outage:
+            while not broker.published:
+                time.sleep(0.1)
+            broker.stop()
+            time.sleep(args.outage)
+            broker.start()
+        broker.thread.join()
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
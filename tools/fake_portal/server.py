@@ -0,0 +1,207 @@
+"""
+Local stand-in for the 95598 portal, for offline benchmarks and regression runs.
+
+Serves snapshots of the login (with slide captcha), userAcc and
+electricityCharge pages that keep the DOM paths SGCCSpider relies on, plus
+the JSON endpoints their script loads data from. Point the spider at it with
+SGCC_BASE_URL:
+
+    python3 tools/fake_portal/server.py --port 8598 --profile realistic
+    SGCC_BASE_URL=http://127.0.0.1:8598 python3 startup.py
+
+The files in pages/ can be replaced with real recorded snapshots as long as
+they keep loading /static/portal.js.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (page latency, api latency, jitter) in seconds
+LATENCY_PROFILES = {
+    "none": (0.0, 0.0, 0.0),
+    "lan": (0.05, 0.02, 0.01),
+    "realistic": (0.8, 0.3, 0.15),
+    "slow": (2.0, 1.0, 0.5),
+}
+
+PAGES = {
+    "/osgweb/login": "login.html",
+    "/osgweb/userAcc": "userAcc.html",
+    "/osgweb/electricityCharge": "electricityCharge.html",
+}
+
+PRICE_PER_KWH = 0.5583
+
+
+class PortalData:
+    """
+    Deterministic fake usage data, stable across restarts for a given seed
+    """
+
+    def __init__(self, accounts=2, seed=95598):
+        self.seed = seed
+        self.accounts = [f"31000{seed % 1000:03d}{i:02d}" for i in range(1, accounts + 1)]
+
+    def daily_usage(self, account, day):
+        rng = random.Random(f"{self.seed}-{account}-{day.isoformat()}")
+        return round(4 + rng.random() * 12, 2)
+
+    def days(self, account, start, end):
+        # Like the portal, data is only available up to yesterday, newest first
+        end = min(end, date.today() - timedelta(days=1))
+        days = []
+        current = end
+        while current >= start:
+            days.append({"day": current.isoformat(), "dayElePq": self.daily_usage(account, current)})
+            current -= timedelta(days=1)
+        return days
+
+    def months(self, account, year):
+        months = []
+        today = date.today()
+        for month in range(1, 13):
+            first = date(year, month, 1)
+            if first > today:
+                break
+            last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            usage = round(sum(d["dayElePq"] for d in self.days(account, first, last)), 2)
+            months.append({"month": f"{year}-{month:02d}", "monthEleNum": usage, "monthEleCost": round(usage * PRICE_PER_KWH, 2)})
+        return months
+
+    def balance(self, account):
+        rng = random.Random(f"{self.seed}-{account}-balance")
+        return round(rng.uniform(-20, 300), 2)
+
+
+class FakePortal:
+    def __init__(self, host="127.0.0.1", port=8598, profile="none", accounts=2, captcha_tolerance=None,
+                 page_latency=None, api_latency=None, jitter=None):
+        default_page, default_api, default_jitter = LATENCY_PROFILES[profile]
+        self.page_latency = default_page if page_latency is None else page_latency
+        self.api_latency = default_api if api_latency is None else api_latency
+        self.jitter = default_jitter if jitter is None else jitter
+        self.captcha_tolerance = captcha_tolerance
+        self.data = PortalData(accounts)
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info(f"Fake 95598 portal listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delay(self, base):
+        if base > 0:
+            time.sleep(max(0.0, base + random.uniform(-self.jitter, self.jitter)))
+
+    def api(self, path, query):
+        account = self.data.accounts[int(query.get("account", ["0"])[0])]
+        if path == "/api/accounts":
+            return {"accounts": [{"consNo": a} for a in self.data.accounts]}
+        if path == "/api/balance":
+            return {"consNo": account, "sumMoney": self.data.balance(account)}
+        if path == "/api/yearly":
+            months = self.data.months(account, int(query.get("year", [date.today().year])[0]))
+            total = round(sum(m["monthEleNum"] for m in months), 2)
+            return {"totalEleNum": total, "totalEleCost": round(total * PRICE_PER_KWH, 2), "monthList": months}
+        if path == "/api/daily":
+            start = datetime.strptime(query["start"][0], "%Y-%m-%d").date()
+            end = datetime.strptime(query["end"][0], "%Y-%m-%d").date()
+            return {"dayList": self.data.days(account, start, end)}
+        return None
+
+    def _handler_class(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logging.debug("fake portal: " + format % args)
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.rstrip("/") or "/"
+
+                if path == "/":
+                    self.send_response(302)
+                    self.send_header("Location", "/osgweb/login")
+                    self.end_headers()
+                elif path in PAGES:
+                    portal.delay(portal.page_latency)
+                    with open(os.path.join(ROOT, "pages", PAGES[path]), "rb") as f:
+                        self._send(200, "text/html; charset=utf-8", f.read())
+                elif path == "/static/portal.js":
+                    with open(os.path.join(ROOT, "static", "portal.js"), "rb") as f:
+                        config = json.dumps({"captchaTolerance": portal.captcha_tolerance})
+                        self._send(200, "application/javascript", f"window.FAKE_PORTAL = {config};\n".encode() + f.read())
+                elif path == "/static/portal.css":
+                    with open(os.path.join(ROOT, "static", "portal.css"), "rb") as f:
+                        self._send(200, "text/css", f.read())
+                elif path.startswith("/api/"):
+                    portal.delay(portal.api_latency)
+                    try:
+                        data = portal.api(path, parse_qs(parsed.query))
+                    except (KeyError, ValueError, IndexError) as e:
+                        self._send(400, "application/json", json.dumps({"code": 400, "message": str(e)}).encode())
+                        return
+                    if data is None:
+                        self._send(404, "application/json", b'{"code": 404}')
+                    else:
+                        body = json.dumps({"code": 200, "data": data}, ensure_ascii=False).encode()
+                        self._send(200, "application/json; charset=utf-8", body)
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the 95598 portal")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8598)
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="realistic", help="Latency profile")
+    parser.add_argument("--page-latency", type=float, help="Override page latency (s)")
+    parser.add_argument("--api-latency", type=float, help="Override API latency (s)")
+    parser.add_argument("--jitter", type=float, help="Override latency jitter (s)")
+    parser.add_argument("--accounts", type=int, default=2, help="Number of user IDs on the account")
+    parser.add_argument("--captcha-tolerance", type=float, help="Reject slides further than this many px from the gap (default: accept any slide)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  [%(levelname)-8s] ---- %(message)s")
+    portal = FakePortal(args.host, args.port, args.profile, args.accounts, args.captcha_tolerance,
+                        args.page_latency, args.api_latency, args.jitter).start()
+    try:
+        portal.thread.join()
+    except KeyboardInterrupt:
+        portal.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+// Minimal stand-in for the 95598 Vue frontend: same DOM paths as the real
+// pages, data loaded over XHR from the fake portal's /api endpoints.
+(function() {
+    var config = window.FAKE_PORTAL || {};
+    var state = {account: 0, year: new Date().getFullYear()};
+
+    function $(selector) { return document.querySelector(selector); }
+    function show(el, visible) { el.classList.toggle('hidden', !visible); }
+    function api(path) { return fetch(path).then(function(r) { return r.json(); }); }
+    function pad(n) { return (n < 10 ? '0' : '') + n; }
+    function isoDate(d) { return d.getFullYear() + '-' + pad(d.getMonth() + 1) + '-' + pad(d.getDate()); }
+    function daysAgo(n) { var d = new Date(); d.setDate(d.getDate() - n); return d; }
+    function cell(text) { return '<td><div class="cell">' + text + '</div></td>'; }
+
+    // ---------------------------------------------------------------- login
+    function initLogin() {
+        var modal = $('#captcha_modal');
+        var canvas = $('#slideVerify').childNodes[0];
+        var slider = $('.slide-verify-slider-mask-item');
+        var gapX = 0;
+
+        function drawCaptcha() {
+            var ctx = canvas.getContext('2d');
+            var gradient = ctx.createLinearGradient(0, 0, canvas.width, canvas.height);
+            gradient.addColorStop(0, 'hsl(' + Math.floor(Math.random() * 360) + ', 55%, 55%)');
+            gradient.addColorStop(1, 'hsl(' + Math.floor(Math.random() * 360) + ', 55%, 35%)');
+            ctx.fillStyle = gradient;
+            ctx.fillRect(0, 0, canvas.width, canvas.height);
+            for (var i = 0; i < 30; i++) {
+                ctx.fillStyle = 'rgba(255, 255, 255, ' + (Math.random() * 0.2) + ')';
+                ctx.beginPath();
+                ctx.arc(Math.random() * canvas.width, Math.random() * canvas.height, Math.random() * 25, 0, Math.PI * 2);
+                ctx.fill();
+            }
+            gapX = 60 + Math.floor(Math.random() * 190);
+            var gapY = 20 + Math.floor(Math.random() * 80);
+            ctx.fillStyle = 'rgba(0, 0, 0, 0.55)';
+            ctx.fillRect(gapX, gapY, 42, 42);
+            ctx.strokeStyle = 'rgba(255, 255, 255, 0.9)';
+            ctx.lineWidth = 2;
+            ctx.strokeRect(gapX, gapY, 42, 42);
+            slider.style.left = '0px';
+        }
+
+        $('.user').addEventListener('click', function() { show($('#login_box'), true); });
+        $('.el-button--primary').addEventListener('click', function() {
+            drawCaptcha();
+            show(modal, true);
+        });
+        $('.slide-verify-refresh-icon').addEventListener('click', drawCaptcha);
+
+        var dragging = false, startX = 0, moved = 0;
+        slider.addEventListener('mousedown', function(e) { dragging = true; startX = e.clientX; moved = 0; });
+        document.addEventListener('mousemove', function(e) {
+            if (!dragging) return;
+            moved = e.clientX - startX;
+            slider.style.left = Math.max(0, moved) + 'px';
+        });
+        document.addEventListener('mouseup', function() {
+            if (!dragging) return;
+            dragging = false;
+            var tolerance = config.captchaTolerance;
+            var scale = canvas.getBoundingClientRect().width / canvas.width;
+            if (tolerance === null || tolerance === undefined || Math.abs(moved - gapX * scale) <= tolerance) {
+                document.cookie = 'fake_session=1; path=/';
+                setTimeout(function() { location.href = '/osgweb/userAcc'; }, 300);
+            } else {
+                show(modal, false);
+            }
+        });
+    }
+
+    // ------------------------------------------------------------- accounts
+    function initAccounts(onSelect) {
+        var menu = $('.el-dropdown-menu');
+        var select = $('.el-select-dropdown');
+        $('.el-dropdown-link').addEventListener('click', function() { show(menu, menu.classList.contains('hidden')); });
+        $('.el-input__suffix').addEventListener('click', function() { show(select, true); });
+
+        return api('/api/accounts').then(function(res) {
+            var accounts = res.data.accounts;
+            menu.innerHTML = accounts.map(function(a) { return '<li>户号：' + a.consNo + '</li>'; }).join('');
+            select.querySelector('ul').innerHTML = accounts.map(function(a) { return '<li><span>' + a.consNo + '</span></li>'; }).join('');
+            Array.prototype.forEach.call(select.querySelectorAll('li span'), function(span, index) {
+                span.addEventListener('click', function() {
+                    state.account = index;
+                    $('.account-input').value = accounts[index].consNo;
+                    show(select, false);
+                    onSelect();
+                });
+            });
+            $('.account-input').value = accounts[0].consNo;
+            onSelect();
+        });
+    }
+
+    // -------------------------------------------------------------- balance
+    function loadBalance() {
+        api('/api/balance?account=' + state.account).then(function(res) {
+            $('.num').textContent = Math.abs(res.data.sumMoney).toFixed(2);
+            $('.amttxt').textContent = res.data.sumMoney < 0 ? '欠费金额' : '账户余额';
+        });
+    }
+
+    // ---------------------------------------------------------------- usage
+    function loadYearly() {
+        api('/api/yearly?account=' + state.account + '&year=' + state.year).then(function(res) {
+            var spans = document.querySelectorAll('.total li span');
+            spans[0].textContent = res.data.totalEleNum;
+            spans[1].textContent = res.data.totalEleCost;
+            $('#pane-first tbody').innerHTML = res.data.monthList.map(function(m) {
+                return '<tr>' + cell(m.month) + cell(m.monthEleNum) + cell(m.monthEleCost) + '</tr>';
+            }).join('');
+        });
+    }
+
+    function loadDaily(start, end) {
+        var inputs = document.querySelectorAll('.el-range-input');
+        inputs[0].value = start;
+        inputs[1].value = end;
+        api('/api/daily?account=' + state.account + '&start=' + start + '&end=' + end).then(function(res) {
+            $('#pane-second tbody').innerHTML = res.data.dayList.map(function(d) {
+                return '<tr>' + cell(d.day) + cell(d.dayElePq) + '</tr>';
+            }).join('');
+        });
+    }
+
+    function initUsage() {
+        var paneFirst = $('#pane-first'), paneSecond = $('#pane-second');
+        $('#tab-first').addEventListener('click', function() {
+            paneFirst.style.display = '';
+            paneSecond.style.display = 'none';
+            loadYearly();
+        });
+        $('#tab-second').addEventListener('click', function() {
+            paneFirst.style.display = 'none';
+            paneSecond.style.display = '';
+        });
+
+        var yearList = $('.year-list');
+        $('.year-input').value = state.year;
+        yearList.innerHTML = [state.year, state.year - 1].map(function(y) { return '<li><span>' + y + '</span></li>'; }).join('');
+        $('.year-input').addEventListener('click', function() { show(yearList, true); });
+        Array.prototype.forEach.call(yearList.querySelectorAll('span'), function(span) {
+            span.addEventListener('click', function() {
+                state.year = parseInt(span.textContent, 10);
+                $('.year-input').value = state.year;
+                show(yearList, false);
+                loadYearly();
+            });
+        });
+
+        var labels = document.querySelectorAll('#pane-second label');
+        labels[0].addEventListener('click', function() { loadDaily(isoDate(daysAgo(7)), isoDate(daysAgo(1))); });
+        labels[1].addEventListener('click', function() { loadDaily(isoDate(daysAgo(30)), isoDate(daysAgo(1))); });
+        Array.prototype.forEach.call(document.querySelectorAll('.el-range-input'), function(input) {
+            input.addEventListener('keydown', function(e) {
+                if (e.key !== 'Enter') return;
+                var inputs = document.querySelectorAll('.el-range-input');
+                loadDaily(inputs[0].value, inputs[1].value);
+            });
+        });
+    }
+
+    // ----------------------------------------------------------------- boot
+    if ($('#login_box')) {
+        initLogin();
+    } else if (document.cookie.indexOf('fake_session=1') === -1) {
+        location.href = '/osgweb/login';
+    } else if ($('#pane-first')) {
+        initUsage();
+        initAccounts(function() {
+            loadYearly();
+            loadDaily(isoDate(daysAgo(7)), isoDate(daysAgo(1)));
+        });
+    } else {
+        initAccounts(loadBalance);
+    }
+})();
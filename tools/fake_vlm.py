@@ -0,0 +1,160 @@
+"""
+Local OpenAI-compatible stand-in for the VLM captcha endpoint.
+
+Answers /v1/chat/completions with the gap box found by the classical solver
+in the uploaded image, after a configurable latency with an optional slow
+tail and failure rate, so the VLM path (timeouts, hedging) can be measured
+without a paid API:
+
+    python3 tools/fake_vlm.py --port 8599 --latency 1.5 --slow-fraction 0.2 --slow-latency 8
+    VLM_BASE_URL=http://127.0.0.1:8599/v1 VLM_API_KEY=test \\
+        python3 tools/eval_captcha.py captcha_dataset --solvers vlm
+    VLM_BASE_URL=http://127.0.0.1:8599/v1 VLM_API_KEY=test VLM_HEDGE_DELAY=3 \\
+        python3 tools/eval_captcha.py captcha_dataset --solvers vlm
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from PIL import Image
+
+from classical_solver import ClassicalCaptchaResolver
+
+
+class FakeVLM:
+    def __init__(self, host="127.0.0.1", port=8599, latency=1.0, jitter=0.2, slow_fraction=0.0, slow_latency=10.0,
+                 fail_fraction=0.0, model_latency=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.fail_fraction = fail_fraction
+        # Per-model base latency overrides, e.g. a faster hedge model
+        self.model_latency = model_latency or {}
+        self.solver = ClassicalCaptchaResolver()
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info(f"Fake VLM listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def answer(self, body):
+        """
+        :return: Assistant message content for a chat completion request
+        """
+        data_url = next(part["image_url"]["url"] for message in body["messages"] for part in message["content"]
+                        if isinstance(part, dict) and part.get("type") == "image_url")
+        image = Image.open(BytesIO(base64.b64decode(data_url.split(",", 1)[1])))
+        gap_x, _ = self.solver.locate_gap(image)
+        piece = image.width * self.solver.piece_ratio
+        return json.dumps({
+            "ymin": 0,
+            "xmin": round(gap_x / image.width * 1000),
+            "ymax": 1000,
+            "xmax": round((gap_x + piece) / image.width * 1000),
+        })
+
+    def delay(self, model):
+        base = self.model_latency.get(model, self.latency)
+        if random.random() < self.slow_fraction:
+            base = self.slow_latency
+        time.sleep(max(0.0, base + random.uniform(-self.jitter, self.jitter)))
+
+    def _handler_class(self):
+        vlm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logging.debug("fake vlm: " + format % args)
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+
+                vlm.requests += 1
+                model = body.get("model", "")
+                vlm.delay(model)
+                if random.random() < vlm.fail_fraction:
+                    self._send(500, {"error": {"message": "simulated failure", "type": "server_error"}})
+                    return
+                try:
+                    content = vlm.answer(body)
+                except (KeyError, StopIteration, ValueError, OSError) as e:
+                    self._send(400, {"error": {"message": f"bad request: {e}", "type": "invalid_request_error"}})
+                    return
+
+                self._send(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for the VLM captcha solver")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--latency", type=float, default=1.0, help="Base response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency jitter (s)")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Share of requests that take --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="Latency of the slow tail (s)")
+    parser.add_argument("--fail-fraction", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS", help="Base latency for one model name")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  [%(levelname)-8s] ---- %(message)s")
+    model_latency = {k: float(v) for k, _, v in (item.partition("=") for item in args.model_latency)}
+    vlm = FakeVLM(args.host, args.port, args.latency, args.jitter, args.slow_fraction, args.slow_latency,
+                  args.fail_fraction, model_latency).start()
+    try:
+        vlm.thread.join()
+    except KeyboardInterrupt:
+        vlm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Build the INT8 variant of the captcha model (captcha.int8.onnx) with
+onnxruntime's quantization tooling. Select it with CAPTCHA_MODEL_VARIANT=int8.
+
+Static quantization (default) calibrates activation ranges on real captcha
+images, which keeps YOLO's conv layers accurate; dynamic quantization needs
+no images but only covers weights:
+
+    python3 tools/quantize_captcha.py --calibration-dir captcha_dataset
+    python3 tools/quantize_captcha.py --method dynamic
+
+Needs the onnx package in addition to onnxruntime. Check the result with
+tools/eval_captcha.py before switching over.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import onnxruntime
+from PIL import Image
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from captcha_solver import MODEL_SIZE, MODEL_VARIANTS
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+class CaptchaCalibrationReader(CalibrationDataReader):
+    """
+    Feeds captcha images preprocessed exactly like CaptchaResolver.predict
+    """
+
+    def __init__(self, model_path, image_dir, limit):
+        self.input_name = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        files = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+        if not files:
+            raise SystemExit(f"No images found in {image_dir}")
+        logging.info(f"Calibrating on {len(files)} images from {image_dir}")
+        self.files = iter(os.path.join(image_dir, f) for f in files)
+
+    def get_next(self):
+        path = next(self.files, None)
+        if path is None:
+            return None
+        img = Image.open(path).resize((MODEL_SIZE, MODEL_SIZE)).convert("RGB")
+        tensor = (np.asarray(img, dtype=np.float32).transpose(2, 0, 1) / 255.0)[None]
+        return {self.input_name: tensor}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the captcha model to INT8")
+    parser.add_argument("--model", default=os.path.join(REPO_ROOT, MODEL_VARIANTS["fp32"]))
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, MODEL_VARIANTS["int8"]))
+    parser.add_argument("--method", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--calibration-dir", help="Directory of captcha images (required for static)")
+    parser.add_argument("--calibration-limit", type=int, default=200, help="Use at most this many images")
+    parser.add_argument("--per-channel", action=argparse.BooleanOptionalAction, default=True, help="Per-channel weight scales")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  [%(levelname)-8s] ---- %(message)s")
+    if args.method == "static" and not args.calibration_dir:
+        parser.error("--calibration-dir is required for static quantization")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference + graph cleanup recommended before quantizing
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(args.model, prepared, skip_symbolic_shape=True)
+
+        if args.method == "static":
+            quantize_static(
+                prepared,
+                args.output,
+                CaptchaCalibrationReader(prepared, args.calibration_dir, args.calibration_limit),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=args.per_channel,
+            )
+        else:
+            quantize_dynamic(prepared, args.output, weight_type=QuantType.QUInt8, per_channel=args.per_channel)
+
+    before = os.path.getsize(args.model) / 1024 / 1024
+    after = os.path.getsize(args.output) / 1024 / 1024
+    logging.info(f"Wrote {args.output} ({before:.1f} MB -> {after:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,122 @@ This script provides a wrapper to save screenshots of errors.
 
 import os
 import logging
+import threading
 import time
+from collections import defaultdict
+from contextlib import contextmanager
 from functools import wraps
 
+
+def data_path(filename):
+    """
+    Resolve a file name inside the persistent data directory
+    (/data in Docker, the working directory otherwise)
+    """
+    if 'PYTHON_IN_DOCKER' in os.environ:
+        return os.path.join("/data", filename)
+    return os.path.join(".", filename)
+
+
+def _process_tree_stat(pid):
+    """
+    /proc/<pid>/stat fields (after the command name) of a process and all its
+    descendants. Returns None where /proc is not available.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+
+    children = {}
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, fields start after the last ')'
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+            stats[int(entry)] = fields
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tree = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        if current in stats:
+            tree.append(stats[current])
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def process_tree_rss_mb(pid):
+    """
+    Resident memory (MB) of a process and all its descendants, read from /proc.
+    Returns None where /proc is not available.
+    """
+    tree = _process_tree_stat(pid)
+    if tree is None:
+        return None
+    return sum(int(fields[21]) for fields in tree) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def process_tree_cpu_seconds(pid):
+    """
+    CPU time (user + system, including reaped children) used so far by a
+    process and all its descendants. Returns None where /proc is not available.
+    """
+    tree = _process_tree_stat(pid)
+    if tree is None:
+        return None
+    ticks = sum(int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14]) for fields in tree)
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StageTimer:
+    """
+    Wall-clock timings of the major phases of a run (login, user list, ...)
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self.timings[name].append(elapsed)
+            logging.info(f"Stage '{name}' took {elapsed:.2f}s")
+
+    def report(self):
+        """
+        Log and return the total time per stage, then start over
+        """
+        totals = {name: sum(values) for name, values in self.timings.items()}
+        for name, total in totals.items():
+            logging.info(f"Stage '{name}': {len(self.timings[name])}x, total {total:.2f}s")
+        self.timings.clear()
+        return totals
+
+
 class ScreenshotOnFailure:
-    _driver = None
+    # Each worker thread drives its own browser
+    _local = threading.local()
     _root_dir = "./errors"
 
     @classmethod
     def set_driver(cls, driver):
-        cls._driver = driver
+        cls._local.driver = driver
+
+    @classmethod
+    def set_recorder(cls, recorder):
+        """
+        Recorder whose buffered frames are flushed to disk when a watched call fails
+        """
+        cls._local.recorder = recorder
 
     @classmethod
     def init(cls, root_dir="./errors"):
@@ -23,10 +129,11 @@ class ScreenshotOnFailure:
 
     @classmethod
     def capture(cls, filename="error.png"):
-        if cls._driver:
+        driver = getattr(cls._local, "driver", None)
+        if driver:
             try:
                 path = os.path.join(cls._root_dir, filename)
-                cls._driver.save_screenshot(path)
+                driver.save_screenshot(path)
                 logging.info(f"Screenshot saved to {path}")
             except Exception as e:
                 logging.error(f"Failed to save screenshot: {e}")
@@ -39,7 +146,13 @@ class ScreenshotOnFailure:
                 return func(*args, **kwargs)
             except Exception as e:
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
-                cls.capture(f"error_{timestamp}.png")
+                cls.capture(f"error_{timestamp}_{threading.current_thread().name}.png")
+                recorder = getattr(cls._local, "recorder", None)
+                if recorder:
+                    try:
+                        recorder.flush(func.__name__)
+                    except Exception as flush_error:
+                        logging.error(f"Failed to save recording: {flush_error}")
                 raise e
         return wrapper
 
@@ -2,20 +2,49 @@ import base64
 import json
 import logging
 import os
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from io import BytesIO
+
+from openai import OpenAI, Timeout
+
+# Plausible gap width as a fraction of the image width
+MIN_PIECE_RATIO = 0.05
+MAX_PIECE_RATIO = 0.35
 
 class VLMCaptchaResolver:
     def __init__(self):
         self.api_key = os.getenv("VLM_API_KEY")
         self.base_url = os.getenv("VLM_BASE_URL", "https://open.bigmodel.cn/api/paas/v4/")
         self.model = os.getenv("VLM_MODEL", "glm-4v")
+        self.confidence = float(os.getenv("VLM_CONFIDENCE", 0.9))
+        self.image_max_width = int(os.getenv("VLM_IMAGE_MAX_WIDTH", 320))
+        self.image_format = os.getenv("VLM_IMAGE_FORMAT", "jpeg").split('#')[0].strip().lower()
+        self.image_quality = int(os.getenv("VLM_IMAGE_QUALITY", 80))
+        # Hedging: after VLM_HEDGE_DELAY seconds without an answer, ask a second model/endpoint too
+        self.hedge_delay = float(os.getenv("VLM_HEDGE_DELAY", 0))
+        self.hedge_model = os.getenv("VLM_HEDGE_MODEL") or self.model
+        self.hedge_base_url = os.getenv("VLM_HEDGE_BASE_URL") or self.base_url
+        self.hedge_api_key = os.getenv("VLM_HEDGE_API_KEY") or self.api_key
         
         if not self.api_key:
             logging.warning("VLM_API_KEY is not set! VLM solver will fail.")
-            
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
+
+        # One client per endpoint for the whole process: keeps the HTTP connection pool warm
+        self.client = self._create_client(self.api_key, self.base_url)
+        self.hedge_client = None
+        if self.hedge_delay > 0:
+            same_endpoint = self.hedge_base_url == self.base_url and self.hedge_api_key == self.api_key
+            self.hedge_client = self.client if same_endpoint else self._create_client(self.hedge_api_key, self.hedge_base_url)
+            logging.info(f"VLM hedging enabled: {self.hedge_model} after {self.hedge_delay}s")
+
+    def _create_client(self, api_key, base_url):
+        return OpenAI(
+            # A missing key should fail the request (and fall back), not the start-up
+            api_key=api_key or "unset",
+            base_url=base_url,
+            timeout=Timeout(float(os.getenv("VLM_READ_TIMEOUT", 20)), connect=float(os.getenv("VLM_CONNECT_TIMEOUT", 5))),
+            max_retries=int(os.getenv("VLM_MAX_RETRIES", 0)),
         )
 
     def encode_image(self, image_data):
@@ -24,19 +53,68 @@ class VLMCaptchaResolver:
         """
         return base64.b64encode(image_data).decode('utf-8')
 
-    def solve_gap(self, image):
+    def prepare_image(self, image):
+        """
+        Downscale and compress the captcha for upload
+        :return: data URL
         """
-        Solve the gap position using VLM
+        if image.width > self.image_max_width:
+            height = round(image.height * self.image_max_width / image.width)
+            image = image.resize((self.image_max_width, height))
+        buffered = BytesIO()
+        if self.image_format == "png":
+            image.save(buffered, format="PNG")
+        else:
+            image.convert("RGB").save(buffered, format=self.image_format.upper(), quality=self.image_quality)
+        return f"data:image/{self.image_format};base64,{self.encode_image(buffered.getvalue())}"
+
+    def locate_gap(self, image, piece=None):
+        """
+        Locate the gap using VLM
         :param image: PIL Image object
-        :return: Gap center X coordinate (normalized to image width if needed, but here we return pixel offset)
+        :param piece: Slider piece canvas, not sent to the model
+        :return: (gap left edge x in image pixels, confidence 0-1); (0, 0.0) when the call or the answer fails
         """
+        start = time.time()
+        try:
+            image_url = self.prepare_image(image)
+        except Exception as e:
+            logging.error(f"VLM Solver failed to encode the image: {e}")
+            return 0, 0.0
+
+        if not self.hedge_client:
+            result = self._ask(self.client, self.model, image_url, image.width)
+        else:
+            result = self._ask_hedged(image_url, image.width)
+        logging.info(f"VLM solve took {time.time() - start:.2f}s")
+        return result
+
+    def _ask_hedged(self, image_url, image_width):
+        """
+        Send the primary request, add the hedge request if it is still pending
+        after hedge_delay and return the first valid answer
+        """
+        # Threads of this call only: a losing request runs on until its own
+        # timeout, it must not hold a worker the next captcha needs
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vlm")
+        try:
+            futures = [executor.submit(self._ask, self.client, self.model, image_url, image_width)]
+            done, _ = wait(futures, timeout=self.hedge_delay)
+            if not done or futures[0].result()[1] <= 0:
+                logging.info(f"No VLM answer after {self.hedge_delay}s, sending hedge request to {self.hedge_model}")
+                futures.append(executor.submit(self._ask, self.hedge_client, self.hedge_model, image_url, image_width))
+
+            for future in as_completed(futures):
+                result = future.result()
+                if result[1] > 0:
+                    # The slower request's answer is ignored
+                    return result
+            return 0, 0.0
+        finally:
+            executor.shutdown(wait=False)
+
+    def _ask(self, client, model, image_url, image_width):
         try:
-            # Convert PIL Image to bytes
-            from io import BytesIO
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            base64_image = self.encode_image(buffered.getvalue())
-            
             # Prompt for the model
             prompt = """
             You are an expert in image processing. 
@@ -46,8 +124,8 @@ class VLMCaptchaResolver:
             The coordinates should be normalized to 1000x1000 scale.
             """
 
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = client.chat.completions.create(
+                model=model,
                 messages=[
                     {
                         "role": "user",
@@ -56,7 +134,7 @@ class VLMCaptchaResolver:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
+                                    "url": image_url
                                 },
                             },
                         ],
@@ -66,29 +144,36 @@ class VLMCaptchaResolver:
             )
 
             content = response.choices[0].message.content
-            logging.info(f"Raw VLM Content: {content}")
-            
-            # Clean up json string if needed (sometimes models wrap in ```json ... ```)
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-                
-            result = json.loads(content)
-            logging.info(f"Parsed VLM Result: {result}")
-            
-            # Calculate center X in 1000x1000 scale
-            x_center_normalized = (result['xmin'] + result['xmax']) / 2
-            
-            # Convert to actual image width
-            real_width = image.width
-            logging.info(f"Image Width: {real_width}, Normalized Center X: {x_center_normalized}")
-            
-            real_x_offset = (x_center_normalized / 1000) * real_width
-            
-            return real_x_offset
+            logging.info(f"Raw VLM Content ({model}): {content}")
+            return self.parse_answer(content, image_width)
             
         except Exception as e:
-            logging.error(f"VLM Solver failed: {e}")
-            # Fallback or re-raise? For now return 0 or raise
-            raise e
+            logging.error(f"VLM Solver failed ({model}): {e}")
+            return 0, 0.0
+
+    def parse_answer(self, content, image_width):
+        """
+        :return: (gap left edge x in image pixels, confidence) from the model's JSON answer
+        """
+        # Clean up json string if needed (sometimes models wrap in ```json ... ```)
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].strip()
+            
+        result = json.loads(content)
+        logging.info(f"Parsed VLM Result: {result}")
+        
+        xmin, xmax = float(result['xmin']), float(result['xmax'])
+        real_x_offset = (xmin / 1000) * image_width
+        logging.info(f"Image Width: {image_width}, Normalized X: {xmin}-{xmax}")
+
+        # The model gives no score; trust answers whose box looks like a puzzle piece
+        box_ratio = (xmax - xmin) / 1000
+        if 0 <= xmin < xmax <= 1000 and MIN_PIECE_RATIO <= box_ratio <= MAX_PIECE_RATIO:
+            return real_x_offset, self.confidence
+        logging.warning(f"VLM box width {box_ratio:.2f} of the image does not look like a puzzle piece")
+        return real_x_offset, self.confidence / 2
+
+    def solve_gap(self, image):
+        return self.locate_gap(image)[0]
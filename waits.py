@@ -0,0 +1,134 @@
+"""
+Condition-based waits for the scraping flow. Every wait returns as soon as
+its condition holds and gives up (without raising) after the step timeout,
+so RETRY_WAIT_TIME_OFFSET_UNIT is only an upper bound, never a fixed cost.
+"""
+
+import logging
+import time
+from collections import defaultdict
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.wait import WebDriverWait
+
+# Injected on every new document: counts in-flight XHR/fetch requests
+JS_TRACK_REQUESTS = """
+    window.__pendingRequests = 0;
+    (function() {
+        var send = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function() {
+            window.__pendingRequests++;
+            this.addEventListener('loadend', function() { window.__pendingRequests--; });
+            return send.apply(this, arguments);
+        };
+        if (window.fetch) {
+            var fetch = window.fetch;
+            window.fetch = function() {
+                window.__pendingRequests++;
+                return fetch.apply(this, arguments).finally(function() { window.__pendingRequests--; });
+            };
+        }
+    })();
+"""
+
+JS_PENDING_REQUESTS = """
+    if (document.readyState !== 'complete') return -1;
+    return window.__pendingRequests || 0;
+"""
+
+# Looks elements up in the page itself so the driver's implicit wait never applies
+JS_FIND_ELEMENT = """
+    var by = arguments[0], value = arguments[1];
+    var el = null;
+    if (by === 'xpath') {
+        el = document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } else if (by === 'id') {
+        el = document.getElementById(value);
+    } else if (by === 'class name') {
+        el = document.querySelector('.' + value);
+    } else {
+        el = document.querySelector(value);
+    }
+    if (!el) return 0;
+    return el.getClientRects().length > 0 ? 2 : 1;
+"""
+
+JS_COUNT_ROWS = """
+    var result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    return result.snapshotLength;
+"""
+
+
+class PageWaiter:
+    def __init__(self, timeout, poll_frequency=0.2):
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+        self.timings = defaultdict(list)
+
+    def _until(self, driver, step, condition, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.time()
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency, ignored_exceptions=(WebDriverException,)).until(condition)
+            ok = True
+        except TimeoutException:
+            ok = False
+        elapsed = time.time() - start
+        self.timings[step].append(elapsed)
+        if ok:
+            logging.debug(f"Wait '{step}' satisfied after {elapsed:.2f}s")
+        else:
+            logging.debug(f"Wait '{step}' timed out after {elapsed:.2f}s, continuing")
+        return ok
+
+    def element(self, driver, step, by, value, visible=True, timeout=None):
+        """
+        Wait until an element is present (and visible, by default)
+        """
+        target = 2 if visible else 1
+        return self._until(driver, step, lambda d: d.execute_script(JS_FIND_ELEMENT, by, value) >= target, timeout)
+
+    def network_idle(self, driver, step, quiet_period=0.5, timeout=None):
+        """
+        Wait until the document has loaded and no XHR/fetch has been in flight
+        for quiet_period seconds
+        """
+        state = {"idle_since": None}
+
+        def idle(d):
+            if d.execute_script(JS_PENDING_REQUESTS) != 0:
+                state["idle_since"] = None
+                return False
+            if state["idle_since"] is None:
+                state["idle_since"] = time.time()
+            return time.time() - state["idle_since"] >= quiet_period
+
+        return self._until(driver, step, idle, timeout)
+
+    def rows_stable(self, driver, step, rows_xpath, timeout=None):
+        """
+        Wait until a table has rows and its row count stopped changing
+        """
+        state = {"count": -1}
+
+        def stable(d):
+            count = d.execute_script(JS_COUNT_ROWS, rows_xpath)
+            settled = count > 0 and count == state["count"]
+            state["count"] = count
+            return settled
+
+        return self._until(driver, step, stable, timeout)
+
+    def url_changed(self, driver, step, url, timeout=None):
+        return self._until(driver, step, lambda d: d.current_url != url, timeout)
+
+    def report(self):
+        """
+        Log where the waiting time went, slowest steps first
+        """
+        if not self.timings:
+            return
+        summary = sorted(self.timings.items(), key=lambda item: sum(item[1]), reverse=True)
+        for step, values in summary:
+            logging.info(f"Wait '{step}': {len(values)}x, total {sum(values):.2f}s, max {max(values):.2f}s")
+        self.timings.clear()